@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
 """ Hash password. """
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+
 import bcrypt
 
 
+HASH_WORKERS = os.cpu_count() or 1
+DEFAULT_ROUNDS = 12
+# Calibration only ever raises the cost, a slow or loaded host must not
+# weaken new hashes below bcrypt's default
+MIN_ROUNDS = DEFAULT_ROUNDS
+MAX_ROUNDS = 16
+TARGET_HASH_SECONDS = 0.25
+_rounds = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
 def hash_password(password: str) -> bytes:
     """Hashes the given password using bcrypt.
 
@@ -12,7 +31,7 @@ def hash_password(password: str) -> bytes:
     Returns:
         bytes: The salted and hashed password.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=current_rounds())
     hashed_password = bcrypt.hashpw(password.encode(), salt)
     return hashed_password
 
@@ -28,3 +47,187 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         bool: True if the password matches, False otherwise.
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def current_rounds() -> int:
+    """Returns the bcrypt cost used for new hashes.
+
+    Returns:
+        int: The calibrated cost, or DEFAULT_ROUNDS before calibration.
+    """
+    return _rounds or DEFAULT_ROUNDS
+
+
+def calibrate_rounds(target: float = TARGET_HASH_SECONDS,
+                     min_rounds: int = MIN_ROUNDS,
+                     max_rounds: int = MAX_ROUNDS) -> int:
+    """Picks the highest bcrypt cost hashing within target on this machine.
+
+    Each extra round doubles the hashing time, so the time measured at
+    min_rounds is extrapolated instead of timing every cost.
+
+    Args:
+        target (float): The latency budget of one hash, in seconds.
+        min_rounds (int): The lowest cost ever returned, never below
+            DEFAULT_ROUNDS.
+        max_rounds (int): The highest cost ever returned.
+
+    Returns:
+        int: The chosen cost, also used by hash_password from now on.
+    """
+    global _rounds
+    min_rounds = max(min_rounds, DEFAULT_ROUNDS)
+    max_rounds = max(max_rounds, min_rounds)
+    salt = bcrypt.gensalt(rounds=min_rounds)
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", salt)
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed * 2 <= target:
+        rounds += 1
+        elapsed *= 2
+    _rounds = rounds
+    return rounds
+
+
+def hash_rounds(hashed_password: bytes) -> int:
+    """Returns the cost a bcrypt hash was made with.
+
+    Args:
+        hashed_password (bytes): The hashed password, like b"$2b$12$...".
+
+    Returns:
+        int: The cost of the hash.
+    """
+    return int(hashed_password.split(b"$")[2])
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """Tells whether a hash uses a cost below the current one.
+
+    Args:
+        hashed_password (bytes): The hashed password.
+
+    Returns:
+        bool: True if the password should be hashed again.
+    """
+    return hash_rounds(hashed_password) < current_rounds()
+
+
+def verify_password(hashed_password: bytes,
+                    password: str) -> Tuple[bool, bool]:
+    """ Validates a password and reports an outdated hash cost.
+
+    Args:
+        hashed_password (bytes): The hashed password.
+        password (str): The password to check.
+
+    Returns:
+        Tuple[bool, bool]: Whether the password matches, and whether the
+            caller should store hash_password(password) instead.
+    """
+    valid = is_valid(hashed_password, password)
+    return valid, valid and needs_rehash(hashed_password)
+
+
+def _executor(workers: int = None) -> ThreadPoolExecutor:
+    """Return the shared hashing thread pool, created on first use.
+
+    Args:
+        workers (int): The pool size, HASH_WORKERS if None. Only used
+            when the pool is created.
+
+    Returns:
+        ThreadPoolExecutor: The shared pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(workers or HASH_WORKERS,
+                                       thread_name_prefix="bcrypt")
+        return _pool
+
+
+def hash_passwords(passwords: Iterable[str],
+                   workers: int = None) -> List[bytes]:
+    """Hashes many passwords in parallel, bcrypt releases the GIL.
+
+    Args:
+        passwords (Iterable[str]): The passwords to hash.
+        workers (int): The number of threads, HASH_WORKERS if None.
+
+    Returns:
+        List[bytes]: The hashed passwords, in the input order.
+    """
+    with ThreadPoolExecutor(workers or HASH_WORKERS) as pool:
+        return list(pool.map(hash_password, passwords))
+
+
+def verify_many(pairs: Iterable[Tuple[bytes, str]],
+                workers: int = None) -> List[bool]:
+    """ Validates many (hashed_password, password) pairs in parallel.
+
+    Args:
+        pairs (Iterable[Tuple[bytes, str]]): The pairs to check.
+        workers (int): The number of threads, HASH_WORKERS if None.
+
+    Returns:
+        List[bool]: Whether each password matches, in the input order.
+    """
+    with ThreadPoolExecutor(workers or HASH_WORKERS) as pool:
+        return list(pool.map(lambda pair: is_valid(*pair), pairs))
+
+
+async def hash_password_async(password: str) -> bytes:
+    """Hashes a password on the shared thread pool.
+
+    Args:
+        password (str): The password to hash.
+
+    Returns:
+        bytes: The salted and hashed password.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), hash_password, password)
+
+
+async def is_valid_async(hashed_password: bytes, password: str) -> bool:
+    """ Validates a password on the shared thread pool.
+
+    Args:
+        hashed_password (bytes): The hashed password.
+        password (str): The password to check.
+
+    Returns:
+        bool: True if the password matches, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), is_valid,
+                                      hashed_password, password)
+
+
+async def hash_passwords_async(passwords: Iterable[str]) -> List[bytes]:
+    """Hashes many passwords concurrently on the shared thread pool.
+
+    Args:
+        passwords (Iterable[str]): The passwords to hash.
+
+    Returns:
+        List[bytes]: The hashed passwords, in the input order.
+    """
+    return list(await asyncio.gather(
+        *[hash_password_async(password) for password in passwords]))
+
+
+async def verify_many_async(pairs: Iterable[Tuple[bytes, str]]
+                            ) -> List[bool]:
+    """ Validates many (hashed_password, password) pairs concurrently.
+
+    Args:
+        pairs (Iterable[Tuple[bytes, str]]): The pairs to check.
+
+    Returns:
+        List[bool]: Whether each password matches, in the input order.
+    """
+    return list(await asyncio.gather(
+        *[is_valid_async(hashed, password) for hashed, password in pairs]))
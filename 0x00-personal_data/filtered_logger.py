@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
 """Filtering log messages."""
 import re
+import atexit
 import logging
-from typing import List
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, List, Tuple
 import mysql.connector
 import os
 
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+REDACTOR_CACHE_SIZE = 128
+EXPORT_BATCH_SIZE = 1000
+POOL_SIZE = 5
+POOL_MAX_IDLE = 300.0
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 100
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_oldest")
 
 
 class RedactingFormatter(logging.Formatter):
@@ -21,13 +37,41 @@ class RedactingFormatter(logging.Formatter):
         """Initialize Redacting Formatter."""
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields or PII_FIELDS
+        self._redact = get_redactor(self.fields, self.REDACTION,
+                                    self.SEPARATOR)
+        self._field_set = frozenset(self.fields)
 
     def format(self, record: logging.LogRecord) -> str:
-        """Format log records."""
+        """Format log records.
+
+        A record whose message is a dict is structured: its PII values are
+        replaced before it is rendered as `key=value;` pairs, so no regex
+        scan is needed unless a key or value holds the separator. Free text
+        messages are redacted after formatting.
+        """
+        if isinstance(record.msg, Mapping):
+            record, plain = self._structured(record)
+            if plain and not record.exc_info and not record.exc_text and \
+                    not record.stack_info:
+                return super().format(record)
         message = super().format(record)
-        return filter_datum(self.fields, self.REDACTION, message, (
-            self.SEPARATOR)
-        )
+        return self._redact(message)
+
+    def _structured(self, record: logging.LogRecord
+                    ) -> Tuple[logging.LogRecord, bool]:
+        """Return a copy of a dict record with its message redacted, and
+        whether its pairs are plain: a separator or a line break inside a
+        key or value could carry more fields, so the message must still go
+        through the redactor."""
+        fields, redaction, separator = \
+            self._field_set, self.REDACTION, self.SEPARATOR
+        record = logging.makeLogRecord(record.__dict__)
+        pairs = [f"{key}={redaction if key in fields else value}"
+                 for key, value in record.msg.items()]
+        plain = not any(separator in pair or "\n" in pair for pair in pairs)
+        record.msg = "".join([pair + separator for pair in pairs])
+        record.args = None
+        return record, plain
 
 
 def filter_datum(fields: List[str], redaction: str, message: str,
@@ -44,14 +88,94 @@ def filter_datum(fields: List[str], redaction: str, message: str,
     Returns:
         The log message obfuscated
     """
+    return get_redactor(fields, redaction, separator)(message)
+
+
+def get_redactor(fields: List[str], redaction: str,
+                 separator: str) -> Callable[[str], str]:
+    """Return the cached redaction function for a set of rules.
+
+    Args:
+        fields: a list of strings representing all fields to obfuscate
+        redaction: a string representing by what the field will be obfuscated
+        separator: a string representing by which character is separating all
+        fields in the log line
+
+    Returns:
+        A function taking a log line and returning it obfuscated
+    """
+    return _build_redactor(tuple(fields), redaction, separator)
+
+
+@lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def _build_redactor(fields: Tuple[str, ...], redaction: str,
+                    separator: str) -> Callable[[str], str]:
+    """Compile the redaction rules once, least recently used rules are
+    evicted when the cache is full.
+
+    Single character separators with plain field names use a single pass
+    scanner, any other combination uses the compiled regex.
+    """
     regex_fields = "|".join(fields)
-    regex = rf"(?<=[{separator}])({regex_fields})=.*?(?=[{separator}]|$)"
-    return re.sub(regex, rf"\1={redaction}", message)
+    regex = re.compile(
+        rf"(?<=[{separator}])({regex_fields})=.*?(?=[{separator}]|$)")
+    replacement = rf"\1={redaction}"
+
+    def regex_redact(message: str) -> str:
+        """Obfuscate the message with the compiled regex."""
+        return regex.sub(replacement, message)
+
+    plain = len(separator) == 1 and re.escape(separator) == separator and \
+        "\\" not in redaction and \
+        all(re.escape(field) == field and "=" not in field and
+            separator not in field for field in fields)
+    if not plain:
+        return regex_redact
+
+    # An empty alternation still matches an empty field name
+    field_set = frozenset(fields or ("",))
+
+    def scan_redact(message: str) -> str:
+        """Obfuscate the message in one pass over `key=value;` pairs."""
+        if "\n" in message:
+            return regex.sub(replacement, message)
+        find = message.find
+        parts = []
+        last = 0
+        equal = -1
+        index = find(separator)
+        while index != -1:
+            start = index + 1
+            index = find(separator, start)
+            if equal < start:
+                equal = find("=", start)
+                if equal == -1:
+                    break
+            if message[start:equal] in field_set:
+                parts.append(message[last:equal + 1])
+                parts.append(redaction)
+                last = index if index != -1 else len(message)
+        if last == 0:
+            return message
+        parts.append(message[last:])
+        return "".join(parts)
+
+    return scan_redact
 
 
-def get_logger() -> logging.Logger:
+def get_logger(queued: bool = False, queue_size: int = LOG_QUEUE_SIZE,
+               batch_size: int = LOG_BATCH_SIZE,
+               overflow: str = "block") -> logging.Logger:
     """Return a logging.Logger object.
 
+    Args:
+        queued: if True, records are put on a bounded queue and redacted
+        and written by a background thread instead of the caller
+        queue_size: the maximum number of records waiting in the queue
+        batch_size: the maximum number of records written at once
+        overflow: what to do with a record when the queue is full, one of
+        "block", "drop_new" or "drop_oldest"
+
     Returns:
         logging.Logger object
     """
@@ -61,47 +185,361 @@ def get_logger() -> logging.Logger:
 
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(RedactingFormatter(PII_FIELDS))
-    logger.addHandler(stream_handler)
+    if queued:
+        listener = BatchingQueueListener(queue.Queue(queue_size),
+                                         stream_handler, batch_size)
+        logger.addHandler(OverflowQueueHandler(listener, overflow))
+    else:
+        logger.addHandler(stream_handler)
 
     return logger
 
 
+_STOP = object()
+
+
+class BatchingQueueListener:
+    """Background thread formatting and writing queued records in batches.
+    """
+
+    def __init__(self, record_queue: queue.Queue,
+                 handler: logging.StreamHandler,
+                 batch_size: int = LOG_BATCH_SIZE) -> None:
+        """Initialize and start the listener.
+
+        Args:
+            record_queue: the queue filled by an OverflowQueueHandler
+            handler: the handler whose formatter and stream are used
+            batch_size: the maximum number of records written at once
+        """
+        self.queue = record_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="user_data-log-listener")
+        self._stopped = False
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self) -> None:
+        """Write batches of records until the stop sentinel is read."""
+        get, get_nowait = self.queue.get, self.queue.get_nowait
+        while True:
+            batch = [get()]
+            try:
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    batch.append(get_nowait())
+            except queue.Empty:
+                pass
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        """Format a batch of records and write them with a single flush."""
+        handler = self.handler
+        try:
+            text = handler.terminator.join(
+                [handler.format(record) for record in batch])
+            with handler.lock:
+                handler.stream.write(text + handler.terminator)
+                handler.flush()
+        except Exception:
+            handler.handleError(batch[0])
+
+    def stop(self) -> None:
+        """Write every queued record, then stop the background thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self.queue.put(_STOP)
+        self._thread.join()
+
+
+class OverflowQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler applying an overflow policy when the queue is full."""
+
+    def __init__(self, listener: BatchingQueueListener,
+                 overflow: str = "block") -> None:
+        """Initialize the handler.
+
+        Args:
+            listener: the listener consuming the queue
+            overflow: one of "block", "drop_new" or "drop_oldest"
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        super().__init__(listener.queue)
+        self.listener = listener
+        self.overflow = overflow
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Prepare a record for the queue, keeping dict messages
+        structured so the listener can redact them before rendering."""
+        if isinstance(record.msg, Mapping):
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg = dict(record.msg)
+            return record
+        return super().prepare(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """Put a record on the queue following the overflow policy."""
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                pass
+            if self.overflow == "drop_new":
+                self.dropped += 1
+                return
+            try:
+                oldest = self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            self.dropped += 1
+            if oldest is _STOP:
+                self.queue.put(oldest)
+                return
+
+    def close(self) -> None:
+        """Flush the queue and stop the listener."""
+        self.listener.stop()
+        super().close()
+
+
+def _db_config() -> dict:
+    """Return the connection arguments from the environment."""
+    return {
+        "user": os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        "password": os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        "host": os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        "database": os.getenv("PERSONAL_DATA_DB_NAME"),
+    }
+
+
 def get_db() -> mysql.connector.connection.MySQLConnection:
     """Return a connector to the database.
 
     Returns:
         mysql.connector.connection.MySQLConnection object
     """
-    username = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    password = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
-    host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db_name = os.getenv("PERSONAL_DATA_DB_NAME")
+    return mysql.connector.connect(**_db_config())
+
+
+class ConnectionPool:
+    """Pool of reusable database connections.
+
+    Connections are rolled back when released, so no transaction or read
+    snapshot carries over to the next borrower, health checked when checked
+    out and closed once they stayed idle for more than max_idle seconds.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, max_idle: float = POOL_MAX_IDLE,
+                 connect: Callable = None, **config) -> None:
+        """Initialize the pool.
+
+        Args:
+            size: the maximum number of connections checked out at once
+            max_idle: seconds after which an idle connection is closed
+            connect: the connection factory, mysql.connector.connect by
+            default, any stand-in taking the same keyword arguments works
+            config: the keyword arguments given to connect
+        """
+        self.size = size
+        self.max_idle = max_idle
+        self._connect = connect or mysql.connector.connect
+        self._config = config
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _evict_idle(self, now: float) -> None:
+        """Close connections idle for longer than max_idle."""
+        with self._lock:
+            stale = []
+            while self._idle and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.popleft()[0])
+        for conn in stale:
+            _close_quietly(conn)
+
+    def acquire(self, timeout: float = None):
+        """Check out a healthy connection.
+
+        Args:
+            timeout: seconds to wait for a free slot, forever if None
+
+        Returns:
+            A database connection
+
+        Raises:
+            TimeoutError: if no connection was released in time
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("connection pool exhausted")
+        try:
+            self._evict_idle(time.monotonic())
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    conn = self._idle.pop()[0]
+                if _is_healthy(conn):
+                    return conn
+                _close_quietly(conn)
+            return self._connect(**self._config)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn) -> None:
+        """Return a connection checked out with acquire to the pool.
+
+        Its open transaction is rolled back first, a connection that fails
+        to roll back is closed instead of pooled.
+        """
+        try:
+            conn.rollback()
+        except Exception:
+            _close_quietly(conn)
+            self._slots.release()
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._idle.append((conn, now))
+        self._slots.release()
+        self._evict_idle(now)
+
+    @contextmanager
+    def connection(self, timeout: float = None) -> Iterator:
+        """Check out a connection for the duration of a with block."""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+
+def _is_healthy(conn) -> bool:
+    """Return True if the connection still answers."""
+    try:
+        return conn.is_connected()
+    except Exception:
+        return False
+
+
+def _close_quietly(conn) -> None:
+    """Close a connection, ignoring errors from a dead one."""
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool() -> ConnectionPool:
+    """Return the process wide connection pool.
+
+    The environment is read once, when the pool is created.
+
+    Returns:
+        ConnectionPool object
+    """
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = ConnectionPool(
+                    size=int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE",
+                                       POOL_SIZE)),
+                    max_idle=float(os.getenv("PERSONAL_DATA_DB_POOL_MAX_IDLE",
+                                             POOL_MAX_IDLE)),
+                    **_db_config())
+    return _db_pool
+
+
+def log_batch(logger: logging.Logger, level: int,
+              messages: Iterable[str]) -> None:
+    """Log a batch of messages with a single level check.
+
+    Args:
+        logger: the logger receiving the messages
+        level: the logging level of every message
+        messages: the log lines to emit
+    """
+    if not logger.isEnabledFor(level):
+        return
+    make_record = logger.makeRecord
+    handle = logger.handle
+    for message in messages:
+        handle(make_record(logger.name, level, "(unknown file)", 0,
+                           message, None, None))
+
+
+def export_users(db: mysql.connector.connection.MySQLConnection,
+                 logger: logging.Logger, batch_size: int = None) -> int:
+    """Stream all rows of the users table to the logger.
 
-    return mysql.connector.connect(
-        user=username,
-        password=password,
-        host=host,
-        database=db_name
-    )
+    Rows are read through an unbuffered cursor with fetchmany, so memory
+    stays bounded by the batch size whatever the size of the table.
+
+    Args:
+        db: a connection to the database
+        logger: the logger receiving one line per row
+        batch_size: the number of rows fetched and logged at once
+
+    Returns:
+        The number of exported rows
+    """
+    if batch_size is None:
+        batch_size = int(os.getenv("PERSONAL_DATA_EXPORT_BATCH_SIZE",
+                                   EXPORT_BATCH_SIZE))
+    cursor = db.cursor(buffered=False)
+    try:
+        cursor.execute("SELECT * FROM users;")
+        prefixes = [f"{field[0]}=" for field in cursor.description]
+        count = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            log_batch(logger, logging.INFO, [
+                "; ".join([prefix + str(value)
+                           for prefix, value in zip(prefixes, row)]) + ";"
+                for row in rows
+            ])
+            count += len(rows)
+        return count
+    finally:
+        cursor.close()
 
 
 def main() -> None:
     """Obtain a database connection and retrieve all rows in the users table.
     """
     db = get_db()
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM users;")
-    fields = [field[0] for field in cursor.description]
-    logger = get_logger()
-
-    for row in cursor:
-        message = ''
-        for i, value in enumerate(row):
-            message += f'{fields[i]}={value}; '
-        logger.info(message.strip())
-
-    cursor.close()
-    db.close()
+    try:
+        export_users(db, get_logger())
+    finally:
+        db.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Redact existing log files in parallel with the filter_datum rules.
+
+Usage: ./redact_logs.py [-w WORKERS] [-c CHUNK_MB] input output
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter, get_redactor
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def line_chunks(path: str, chunk_size: int = CHUNK_SIZE
+                ) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte offsets of line aligned chunks of a file.
+
+    Args:
+        path: the file to split
+        chunk_size: the approximate size of a chunk in bytes
+
+    Yields:
+        The offsets of each chunk, every chunk but the last ends with a
+        newline
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return
+    with open(path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(start + chunk_size, size)
+            if end < size:
+                newline = mm.find(b"\n", end - 1)
+                end = size if newline == -1 else newline + 1
+            yield start, end
+            start = end
+
+
+def redact_chunk(path: str, start: int, end: int, fields: List[str],
+                 redaction: str, separator: str) -> bytes:
+    """Return a chunk of the file with every line passed to filter_datum.
+
+    Args:
+        path: the file to read
+        start: the offset of the first byte of the chunk
+        end: the offset following the last byte of the chunk
+        fields: a list of strings representing all fields to obfuscate
+        redaction: a string representing by what the field will be obfuscated
+        separator: a string representing by which character is separating all
+        fields in a line
+
+    Returns:
+        The redacted chunk
+    """
+    redact = get_redactor(fields, redaction, separator)
+    with open(path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode("utf-8", "surrogateescape")
+    lines = text.split("\n")
+    return "\n".join([redact(line) for line in lines]).encode(
+        "utf-8", "surrogateescape")
+
+
+def redact_file(source: str, destination: str, fields: List[str],
+                redaction: str = RedactingFormatter.REDACTION,
+                separator: str = RedactingFormatter.SEPARATOR,
+                workers: int = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Redact a file into another one, keeping the order of the lines.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    whatever the size of the input.
+
+    Returns:
+        The number of bytes read
+    """
+    workers = workers or os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool, \
+            open(destination, "wb") as out:
+        for start, end in line_chunks(source, chunk_size):
+            if len(pending) >= 2 * workers:
+                out.write(pending.popleft().result())
+            pending.append(pool.submit(redact_chunk, source, start, end,
+                                       fields, redaction, separator))
+        while pending:
+            out.write(pending.popleft().result())
+    return os.path.getsize(source)
+
+
+def main() -> None:
+    """Parse the command line, redact the file and report throughput."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("-f", "--fields", default=",".join(PII_FIELDS),
+                        help="comma separated fields to obfuscate")
+    parser.add_argument("-r", "--redaction",
+                        default=RedactingFormatter.REDACTION)
+    parser.add_argument("-s", "--separator",
+                        default=RedactingFormatter.SEPARATOR)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("-c", "--chunk-mb", type=int,
+                        default=CHUNK_SIZE // (1024 * 1024))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    size = redact_file(args.input, args.output, args.fields.split(","),
+                       args.redaction, args.separator, args.workers,
+                       args.chunk_mb * 1024 * 1024)
+    elapsed = time.perf_counter() - start
+    print(f"redacted {size / 1e6:.1f} MB in {elapsed:.2f}s "
+          f"({size / 1e6 / max(elapsed, 1e-9):.1f} MB/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
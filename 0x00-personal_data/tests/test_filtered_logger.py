@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests of the filtered_logger module."""
+import unittest
+from filtered_logger import ConnectionPool
+
+
+class StandInConnection:
+    """Connection recording the calls made by the pool."""
+
+    def __init__(self, fail_rollback: bool = False) -> None:
+        """Initialize the connection."""
+        self.fail_rollback = fail_rollback
+        self.rollbacks = 0
+        self.closed = False
+
+    def rollback(self) -> None:
+        """Roll back the open transaction."""
+        if self.fail_rollback:
+            raise OSError("connection lost")
+        self.rollbacks += 1
+
+    def is_connected(self) -> bool:
+        """Return True until closed."""
+        return not self.closed
+
+    def close(self) -> None:
+        """Close the connection."""
+        self.closed = True
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Tests of ConnectionPool."""
+
+    def test_release_rolls_back(self):
+        """A released connection is rolled back before it is reused."""
+        pool = ConnectionPool(size=1, connect=StandInConnection)
+        with pool.connection() as conn:
+            self.assertEqual(conn.rollbacks, 0)
+        self.assertEqual(conn.rollbacks, 1)
+        with pool.connection() as again:
+            self.assertIs(again, conn)
+
+    def test_release_rolls_back_after_error(self):
+        """A connection is rolled back when the with block raised."""
+        pool = ConnectionPool(size=1, connect=StandInConnection)
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError("query failed")
+        self.assertEqual(conn.rollbacks, 1)
+
+    def test_failed_rollback_drops_connection(self):
+        """A connection failing to roll back is closed, not pooled."""
+        pool = ConnectionPool(
+            size=1, connect=lambda: StandInConnection(fail_rollback=True))
+        with pool.connection() as conn:
+            pass
+        self.assertTrue(conn.closed)
+        with pool.connection(timeout=1) as other:
+            self.assertIsNot(other, conn)
+
+
+if __name__ == "__main__":
+    unittest.main()
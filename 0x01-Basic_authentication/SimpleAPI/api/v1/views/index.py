@@ -3,6 +3,16 @@
 """
 from flask import jsonify, abort
 from api.v1.views import app_views
+from models.user import User
+from os import getenv
+import threading
+import time
+
+
+# seconds during which /stats serves the same snapshot
+STATS_REFRESH = float(getenv("API_STATS_REFRESH", "5"))
+_stats_lock = threading.Lock()
+_stats_cache = {'expires': 0.0, 'stats': None}
 
 
 @app_views.route('/status', methods=['GET'], strict_slashes=False)
@@ -19,8 +29,24 @@ def stats() -> str:
     """ GET /api/v1/stats
     Return:
       - the number of each objects
+      - the counters of each model: creations, updates and deletions,
+        creations and deletions of the last interval, size on disk
+    """
+    return jsonify(_cached_stats())
+
+
+def _cached_stats() -> dict:
+    """ Return the stats snapshot, rebuilt once every STATS_REFRESH
+    seconds
     """
-    from models.user import User
-    stats = {}
-    stats['users'] = User.count()
-    return jsonify(stats)
+    with _stats_lock:
+        now = time.monotonic()
+        if _stats_cache['stats'] is None or now >= _stats_cache['expires']:
+            user_stats = User.stats()
+            _stats_cache['stats'] = {
+                'users': user_stats['count'],
+                'models': {'User': user_stats},
+                'refresh': STATS_REFRESH,
+            }
+            _stats_cache['expires'] = now + STATS_REFRESH
+        return _stats_cache['stats']
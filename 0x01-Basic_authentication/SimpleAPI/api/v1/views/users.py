@@ -2,18 +2,69 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request
 from models.user import User
+from typing import List, Tuple
+
+
+STREAM_PAGE_SIZE = 100
+BATCH_MAX_SIZE = 1000
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users, ordered by ID
+      - after: ID of the last user of the previous page
+      - stream: if "true", the list is sent in chunks
     Return:
       - list of all User objects JSON represented
+      - X-Next-After header with the cursor of the next page, if any
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get("after")
+    limit = request.args.get("limit")
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            return jsonify({'error': "limit must be a positive integer"}), 400
+    if request.args.get("stream") == "true":
+        return Response(_stream_users(after, limit),
+                        mimetype="application/json")
+    if limit is None and after is None:
+        users = User.all()
+    else:
+        users = User.page(after, limit)
+    body = ",".join([user.to_json_str() for user in users])
+    response = Response("[" + body + "]\n", mimetype="application/json")
+    if limit is not None and len(users) == limit:
+        response.headers["X-Next-After"] = users[-1].id
+    return response
+
+
+def _stream_users(after: str = None, limit: int = None):
+    """ Yield the JSON list of users ordered by ID, one page at a time
+    """
+    yield "["
+    sep = ""
+    while limit is None or limit > 0:
+        size = STREAM_PAGE_SIZE if limit is None \
+            else min(limit, STREAM_PAGE_SIZE)
+        users = User.page(after, size)
+        if len(users) == 0:
+            break
+        yield sep + ",".join([user.to_json_str() for user in users])
+        sep = ","
+        after = users[-1].id
+        if limit is not None:
+            limit -= len(users)
+        if len(users) < size:
+            break
+    yield "]\n"
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -30,7 +81,7 @@ def view_one_user(user_id: str = None) -> str:
     user = User.get(user_id)
     if user is None:
         abort(404)
-    return jsonify(user.to_json())
+    return Response(user.to_json_str() + "\n", mimetype="application/json")
 
 
 @app_views.route('/users/<user_id>', methods=['DELETE'], strict_slashes=False)
@@ -64,24 +115,13 @@ def create_user() -> str:
       - 400 if can't create the new User
     """
     rj = None
-    error_msg = None
     try:
         rj = request.get_json()
     except Exception as e:
         rj = None
-    if rj is None:
-        error_msg = "Wrong format"
-    if error_msg is None and rj.get("email", "") == "":
-        error_msg = "email missing"
-    if error_msg is None and rj.get("password", "") == "":
-        error_msg = "password missing"
+    user, error_msg = _new_user(rj)
     if error_msg is None:
         try:
-            user = User()
-            user.email = rj.get("email")
-            user.password = rj.get("password")
-            user.first_name = rj.get("first_name")
-            user.last_name = rj.get("last_name")
             user.save()
             return jsonify(user.to_json()), 201
         except Exception as e:
@@ -89,6 +129,29 @@ def create_user() -> str:
     return jsonify({'error': error_msg}), 400
 
 
+def _new_user(rj: dict) -> Tuple[User, str]:
+    """ Build a User not saved yet from a JSON body
+    Return:
+      - the User and None
+      - or None and an error message if the body is invalid
+    """
+    if type(rj) is not dict:
+        return None, "Wrong format"
+    if rj.get("email", "") == "":
+        return None, "email missing"
+    if rj.get("password", "") == "":
+        return None, "password missing"
+    try:
+        user = User()
+        user.email = rj.get("email")
+        user.password = rj.get("password")
+        user.first_name = rj.get("first_name")
+        user.last_name = rj.get("last_name")
+    except Exception as e:
+        return None, "Can't create User: {}".format(e)
+    return user, None
+
+
 @app_views.route('/users/<user_id>', methods=['PUT'], strict_slashes=False)
 def update_user(user_id: str = None) -> str:
     """ PUT /api/v1/users/:id
@@ -112,11 +175,149 @@ def update_user(user_id: str = None) -> str:
         rj = request.get_json()
     except Exception as e:
         rj = None
-    if rj is None:
+    if type(rj) is not dict:
         return jsonify({'error': "Wrong format"}), 400
+    _update_user(user, rj)
+    user.save()
+    return jsonify(user.to_json()), 200
+
+
+def _update_user(user: User, rj: dict):
+    """ Apply the attributes of a JSON body to a User
+    """
     if rj.get('first_name') is not None:
         user.first_name = rj.get('first_name')
     if rj.get('last_name') is not None:
         user.last_name = rj.get('last_name')
-    user.save()
-    return jsonify(user.to_json()), 200
+
+
+def _batch_body() -> Tuple[list, str]:
+    """ Read the JSON list of a batch request
+    Return:
+      - the list and None
+      - or None and an error message if the body isn't a list of at most
+        BATCH_MAX_SIZE items
+    """
+    try:
+        rj = request.get_json()
+    except Exception as e:
+        rj = None
+    if type(rj) is not list:
+        return None, "Wrong format"
+    if len(rj) > BATCH_MAX_SIZE:
+        return None, "batch too large, {} items maximum".format(
+            BATCH_MAX_SIZE)
+    return rj, None
+
+
+def _batch_results(results: List[tuple]) -> list:
+    """ Turn (status, User or error message) pairs into JSON results
+    """
+    json_results = []
+    for status, result in results:
+        if isinstance(result, User):
+            json_results.append({'status': status, 'user': result.to_json()})
+        else:
+            json_results.append({'status': status, 'error': result})
+    return json_results
+
+
+@app_views.route('/users/batch', methods=['POST'], strict_slashes=False)
+def create_users() -> str:
+    """ POST /api/v1/users/batch
+    JSON body:
+      - list of users, each like the body of POST /api/v1/users
+    Return:
+      - list of results, in the order of the body, each either:
+        - status 201 and the User object JSON represented as user
+        - status 400 and error if this User can't be created
+      - 400 if the body isn't a list or the batch can't be saved
+    """
+    rj, error_msg = _batch_body()
+    if error_msg is not None:
+        return jsonify({'error': error_msg}), 400
+    results = []
+    users = []
+    for item in rj:
+        user, error_msg = _new_user(item)
+        if user is None:
+            results.append((400, error_msg))
+        else:
+            users.append(user)
+            results.append((201, user))
+    try:
+        User.save_batch(saved=users)
+    except Exception as e:
+        return jsonify({'error': "Can't create Users: {}".format(e)}), 400
+    return jsonify(_batch_results(results)), 200
+
+
+@app_views.route('/users/batch', methods=['PUT'], strict_slashes=False)
+def update_users() -> str:
+    """ PUT /api/v1/users/batch
+    JSON body:
+      - list of updates, each with the User ID as id and the attributes
+        of the body of PUT /api/v1/users/:id
+    Return:
+      - list of results, in the order of the body, each either:
+        - status 200 and the User object JSON represented as user
+        - status 404 if the User ID doesn't exist
+        - status 400 and error if the update isn't a JSON object
+      - 400 if the body isn't a list or the batch can't be saved
+    """
+    rj, error_msg = _batch_body()
+    if error_msg is not None:
+        return jsonify({'error': error_msg}), 400
+    results = []
+    users = {}
+    for item in rj:
+        if type(item) is not dict:
+            results.append((400, "Wrong format"))
+            continue
+        user = User.get(item.get('id')) if type(item.get('id')) is str \
+            else None
+        if user is None:
+            results.append((404, "Not found"))
+            continue
+        _update_user(user, item)
+        users[user.id] = user
+        results.append((200, user))
+    try:
+        User.save_batch(saved=users.values())
+    except Exception as e:
+        return jsonify({'error': "Can't update Users: {}".format(e)}), 400
+    return jsonify(_batch_results(results)), 200
+
+
+@app_views.route('/users/batch', methods=['DELETE'], strict_slashes=False)
+def delete_users() -> str:
+    """ DELETE /api/v1/users/batch
+    JSON body:
+      - list of User IDs
+    Return:
+      - list of results, in the order of the body, each either:
+        - status 200 if the User has been correctly deleted, also when
+          its ID is repeated in the list
+        - status 404 if the User ID doesn't exist
+      - 400 if the body isn't a list or the batch can't be saved
+    """
+    rj, error_msg = _batch_body()
+    if error_msg is not None:
+        return jsonify({'error': error_msg}), 400
+    results = []
+    users = {}
+    for user_id in rj:
+        if type(user_id) is str and user_id in users:
+            results.append({'status': 200})
+            continue
+        user = User.get(user_id) if type(user_id) is str else None
+        if user is None:
+            results.append({'status': 404, 'error': "Not found"})
+            continue
+        users[user.id] = user
+        results.append({'status': 200})
+    try:
+        User.save_batch(removed=users.values())
+    except Exception as e:
+        return jsonify({'error': "Can't delete Users: {}".format(e)}), 400
+    return jsonify(results), 200
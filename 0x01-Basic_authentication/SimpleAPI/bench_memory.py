@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+""" Benchmark memory used by User objects kept in DATA
+
+Usage: python3 bench_memory.py [number_of_users]
+"""
+import sys
+import tracemalloc
+from models.base import DATA
+from models.user import User
+
+
+def main():
+    """ Create users in DATA and report the memory they use
+    """
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    User()
+    DATA['User'] = {}
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        user = User(email="user{}@example.com".format(i),
+                    first_name="First", last_name="Last")
+        user.password = "pwd"
+        DATA['User'][user.id] = user
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print("{} users: {:.1f} MB, {:.0f} bytes per user".format(
+        n, used / 1e6, used / n))
+
+
+if __name__ == "__main__":
+    main()
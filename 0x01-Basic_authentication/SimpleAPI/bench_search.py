@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+""" Benchmark User.search by email: linear scan vs hash index, and
+User.query by email prefix: linear scan vs sorted index
+
+Usage: python3 bench_search.py [number_of_users]
+"""
+import sys
+import time
+from models.base import DATA, SORTED_STALE
+from models.user import User
+
+
+def main():
+    """ Load users in memory, then time email lookups both ways
+    """
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = 20
+    # like a load, the sorted indexes are built at once on the first query
+    User.load_from_file()
+    SORTED_STALE['User'] = True
+    for i in range(n):
+        user = User(email="user{}@example.com".format(i))
+        DATA['User'][user.id] = user
+        user._index()
+    emails = ["user{}@example.com".format(i * (n // lookups))
+              for i in range(lookups)]
+
+    start = time.perf_counter()
+    for email in emails:
+        assert len(User.search({'email': email})) == 1
+    indexed = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    for email in emails:
+        assert len([u for u in DATA['User'].values()
+                    if u.email == email]) == 1
+    scan = (time.perf_counter() - start) / lookups
+
+    print("{} users".format(n))
+    print("scan:    {:.6f}s per lookup".format(scan))
+    print("indexed: {:.6f}s per lookup ({:.0f}x)".format(
+        indexed, scan / indexed))
+
+    User.query('email', limit=1)
+    prefixes = [email[:-len("0@example.com")] for email in emails]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        assert len(User.query('email', prefix=prefix, limit=10)) == 10
+    indexed = (time.perf_counter() - start) / lookups
+
+    start = time.perf_counter()
+    for prefix in prefixes:
+        assert len(sorted(u.email for u in DATA['User'].values()
+                          if u.email.startswith(prefix))[:10]) == 10
+    scan = (time.perf_counter() - start) / lookups
+
+    print("prefix scan:    {:.6f}s per query".format(scan))
+    print("prefix indexed: {:.6f}s per query ({:.0f}x)".format(
+        indexed, scan / indexed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+""" Benchmark User.load_from_file: JSON vs binary vs lazy binary snapshot
+
+Usage: python3 bench_startup.py [number_of_users]
+"""
+import os
+import sys
+import tempfile
+import time
+from models import base
+from models.base import DATA
+from models.user import User
+
+
+def timed_load(snapshot_format: str, lazy: bool) -> float:
+    """ Return the seconds taken by User.load_from_file
+    """
+    base.SNAPSHOT_FORMAT = snapshot_format
+    base.LAZY_LOAD = lazy
+    start = time.perf_counter()
+    User.load_from_file()
+    elapsed = time.perf_counter() - start
+    assert User.count() == len(DATA['User'])
+    return elapsed
+
+
+def main():
+    """ Write both snapshot formats, then time loading each of them
+    """
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    os.chdir(tempfile.mkdtemp())
+    DATA['User'] = {}
+    for i in range(n):
+        user = User(email="user{}@example.com".format(i),
+                    first_name="First{}".format(i), last_name="Last")
+        user.password = "pwd{}".format(i)
+        DATA['User'][user.id] = user
+    for snapshot_format in ("json", "binary"):
+        base.SNAPSHOT_FORMAT = snapshot_format
+        User.save_to_file()
+
+    print("{} users".format(n))
+    json_time = timed_load("json", False)
+    print("json:          {:.3f}s".format(json_time))
+    for label, lazy in (("binary:       ", False), ("binary (lazy):", True)):
+        elapsed = timed_load("binary", lazy)
+        print("{} {:.3f}s ({:.1f}x)".format(label, elapsed,
+                                            json_time / elapsed))
+
+
+if __name__ == "__main__":
+    main()
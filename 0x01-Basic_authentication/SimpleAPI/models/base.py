@@ -1,37 +1,126 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from array import array
+from datetime import datetime, timedelta
+from typing import TypeVar, List, Iterable, Callable
+from bisect import bisect_left, bisect_right, insort
+from os import getenv, path
+from models.coherence import file_lock, file_signature
+from models.journal import Journal, write_json_file
+from models.lock import ReadWriteLock
+from models.snapshot import (MISSING, NO_TIMESTAMP, BinarySnapshot,
+                             LazyObjects, write_binary_snapshot)
+from models.stats import Counters
+from models.write_behind import WriteBehind
 import json
+import os
+import threading
 import uuid
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# "snapshot" rewrites the whole file on each write, "journal" appends,
+# "write_behind" rewrites it in the background for many writes at once
+STORAGE_MODE = getenv("MODELS_STORAGE", "snapshot")
+# "json" or "binary" snapshot files, binary ones can be loaded lazily
+SNAPSHOT_FORMAT = getenv("MODELS_SNAPSHOT_FORMAT", "json")
+LAZY_LOAD = getenv("MODELS_LAZY_LOAD", "0") == "1"
+# in "snapshot" mode, pick up the writes of other processes
+COHERENCE = getenv("MODELS_COHERENCE", "0") == "1"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+_MISSING = object()
 DATA = {}
+INDEXES = {}
+INDEXED_VALUES = {}
+SORTED_IDS = {}
+SORTED_INDEXES = {}
+SORTED_VALUES = {}
+# classes whose sorted indexes are rebuilt at once on their next query
+SORTED_STALE = {}
+SIGNATURES = {}
+LOCKS = {}
+FILE_LOCKS = {}
+COUNTERS = {}
+_LOCKS_LOCK = threading.Lock()
+JOURNALS = {}
+WRITE_BEHIND = WriteBehind()
+
+
+def flush():
+    """ Save now the classes with pending write-behind mutations
+    """
+    WRITE_BEHIND.flush()
+
+
+def _to_micros(value: datetime):
+    """ Convert a naive datetime to integer microseconds since EPOCH,
+    other values are kept as is
+    """
+    if type(value) is datetime and value.tzinfo is None:
+        return (value - EPOCH) // MICROSECOND
+    return value
+
+
+def _from_micros(value) -> datetime:
+    """ Convert integer microseconds since EPOCH back to a datetime
+    """
+    if type(value) is int:
+        return EPOCH + value * MICROSECOND
+    return value
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+    """
+    if len(value) == 19:
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def _prefix_end(prefix: str) -> str:
+    """ Return the smallest string greater than all the strings starting
+    with prefix, or None if there is no such string
+    """
+    prefix = prefix.rstrip(chr(0x10ffff))
+    if len(prefix) == 0:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
 
 
 class Base():
     """ Base class
+
+    Declared attributes live in slots and timestamps are kept as integer
+    microseconds since EPOCH; other attributes still go to __dict__.
     """
 
+    __slots__ = ('id', '_created_at', '_updated_at', '_json_cache',
+                 '__dict__')
+    # declared attributes, in to_json order
+    ATTRIBUTES = ('id', 'created_at', 'updated_at')
+    # attributes looked up through a hash index by search()
+    INDEXED_ATTRIBUTES = ()
+    # attributes kept in a sorted index for range and prefix queries
+    SORTED_ATTRIBUTES = ()
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
+            self.__class__._reset_indexes()
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self._json_cache = None
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = _parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = _parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -44,11 +133,47 @@ class Base():
             return False
         return (self.id == other.id)
 
+    def _share_id(self, key: str) -> str:
+        """ Make the id and an equal DATA key the same string object,
+        so each id is stored once
+        """
+        if self.id == key:
+            self.id = key
+        return key
+
+    @property
+    def created_at(self) -> datetime:
+        """ Getter of the creation time
+        """
+        return _from_micros(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation time
+        """
+        self._created_at = _to_micros(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Getter of the last update time
+        """
+        return _from_micros(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update time
+        """
+        self._updated_at = _to_micros(value)
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        attributes = [(key, getattr(self, key, _MISSING)) for key in
+                      self.ATTRIBUTES]
+        for key, value in attributes + list(self.__dict__.items()):
+            if value is _MISSING:
+                continue
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,20 +182,71 @@ class Base():
                 result[key] = value
         return result
 
+    def to_json_str(self) -> str:
+        """ Return to_json() encoded like jsonify does, cached until the
+        next save
+
+        The cache is filled under the read lock, so a save clearing it
+        under the write lock can't be followed by an older fragment.
+        """
+        json_str = self._json_cache
+        if json_str is None:
+            with self._lock().read():
+                json_str = json.dumps(self.to_json(), sort_keys=True,
+                                      separators=(',', ':'))
+                self._json_cache = json_str
+        return json_str
+
+    @classmethod
+    def _lock(cls) -> ReadWriteLock:
+        """ Return the lock guarding DATA and the indexes of the class
+        """
+        s_class = cls.__name__
+        if LOCKS.get(s_class) is None:
+            with _LOCKS_LOCK:
+                if LOCKS.get(s_class) is None:
+                    FILE_LOCKS[s_class] = threading.Lock()
+                    COUNTERS[s_class] = Counters()
+                    LOCKS[s_class] = ReadWriteLock()
+        return LOCKS[s_class]
+
     @classmethod
     def load_from_file(cls):
         """ Load all objects from file
         """
+        with cls._lock().write():
+            cls._load_from_file()
+
+    @classmethod
+    def _load_from_file(cls):
+        """ Load all objects from file, called with the write lock held
+
+        Without a binary snapshot yet, the JSON one is loaded, so switching
+        to MODELS_SNAPSHOT_FORMAT=binary keeps the existing objects.
+        """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
         DATA[s_class] = {}
-        if not path.exists(file_path):
+        cls._reset_indexes()
+        SORTED_STALE[s_class] = True
+        SIGNATURES[s_class] = file_signature(cls._snapshot_path())
+        if STORAGE_MODE == "journal":
+            objs_json = cls._journal().read_state()
+        elif SNAPSHOT_FORMAT == "binary" and \
+                path.exists(".db_{}.bin".format(s_class)):
+            cls._load_binary()
+            return
+        elif not path.exists(file_path):
             return
+        else:
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        for obj_id, obj_json in objs_json.items():
+            obj = cls(**obj_json)
+            DATA[s_class][obj._share_id(obj_id)] = obj
+            obj._index()
+        SORTED_IDS[s_class] = sorted(DATA[s_class].keys())
 
     @classmethod
     def save_to_file(cls):
@@ -78,35 +254,464 @@ class Base():
         """
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
+        lock = cls._lock()
+        with FILE_LOCKS[s_class]:
+            with lock.read():
+                binary = SNAPSHOT_FORMAT == "binary" and \
+                    STORAGE_MODE != "journal"
+                if binary:
+                    columns = cls._binary_columns()
+                else:
+                    objs_json = {}
+                    for obj_id, obj in DATA[s_class].items():
+                        objs_json[obj_id] = obj.to_json(True)
+                if STORAGE_MODE == "journal":
+                    # appends wait, so none is lost when journals are cleared
+                    cls._journal().write_snapshot(objs_json)
+                    return
+
+            fsync = STORAGE_MODE == "write_behind"
+            if binary:
+                write_binary_snapshot(".db_{}.bin".format(s_class),
+                                      *columns, fsync=fsync)
+            else:
+                write_json_file(file_path, objs_json, fsync)
+            SIGNATURES[s_class] = file_signature(cls._snapshot_path())
+
+    @classmethod
+    def _snapshot_path(cls) -> str:
+        """ Return the snapshot file of the class in SNAPSHOT_FORMAT
+        """
+        extension = "bin" if SNAPSHOT_FORMAT == "binary" else "json"
+        return ".db_{}.{}".format(cls.__name__, extension)
+
+    @classmethod
+    def _coherent(cls) -> bool:
+        """ Tell whether the class follows the writes of other processes
+        """
+        return COHERENCE and STORAGE_MODE == "snapshot"
+
+    @classmethod
+    def _file_lock(cls, exclusive: bool):
+        """ Return the advisory lock shared by the processes using the
+        snapshot file of the class
+        """
+        return file_lock(".db_{}.lock".format(cls.__name__), exclusive)
+
+    @classmethod
+    def _refresh(cls):
+        """ Reload the objects written by other processes if the snapshot
+        file changed since this process last read or wrote it
+        """
+        if not cls._coherent():
+            return
+        s_class = cls.__name__
+        if file_signature(cls._snapshot_path()) == SIGNATURES.get(s_class):
+            return
+        with cls._file_lock(False):
+            cls._reload_changes()
+
+    @classmethod
+    def _reload_changes(cls):
+        """ Apply the snapshot file to DATA, only building the objects that
+        changed, called with the file lock held
+        """
+        s_class = cls.__name__
+        file_path = cls._snapshot_path()
+        signature = file_signature(file_path)
+        if signature == SIGNATURES.get(s_class):
+            return
         objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        loaded = {}
+        if signature is None:
+            pass
+        elif SNAPSHOT_FORMAT == "binary":
+            snapshot = BinarySnapshot(file_path)
+            load = cls._binary_loader(snapshot, True)
+            for index in range(snapshot.count):
+                obj = load(index)
+                loaded[obj.id] = obj
+                objs_json[obj.id] = obj.to_json(True)
+        else:
+            with open(file_path, 'r') as f:
+                objs_json = json.load(f)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+        with cls._lock().write():
+            objs = DATA[s_class]
+            for obj_id in [k for k in objs.keys() if k not in objs_json]:
+                objs[obj_id]._unstore()
+            for obj_id, obj_json in objs_json.items():
+                current = objs.get(obj_id)
+                if current is None or current.to_json(True) != obj_json:
+                    obj = loaded.get(obj_id) or cls(**obj_json)
+                    obj._share_id(obj_id)
+                    obj._store()
+            SIGNATURES[s_class] = signature
+
+    @classmethod
+    def _load_binary(cls):
+        """ Load all objects from the binary snapshot, lazily if LAZY_LOAD
+        """
+        s_class = cls.__name__
+        file_path = ".db_{}.bin".format(s_class)
+        if not path.exists(file_path):
+            return
+        snapshot = BinarySnapshot(file_path)
+        load = cls._binary_loader(snapshot, not LAZY_LOAD)
+
+        def load_indexed(index: int) -> Base:
+            """ Build and index the object of a record
+            """
+            obj = load(index)
+            obj._index()
+            return obj
+
+        SORTED_IDS[s_class] = sorted(snapshot.ids)
+        if LAZY_LOAD:
+            DATA[s_class] = LazyObjects(snapshot.ids, load_indexed)
+            return
+        objs = DATA[s_class]
+        for index in range(snapshot.count):
+            obj = load(index)
+            objs[obj.id] = obj
+            obj._index()
+
+    @classmethod
+    def _binary_columns(cls) -> tuple:
+        """ Return the arguments of write_binary_snapshot after the file
+        path, called with the read lock held
+
+        Declared attributes that are neither strings nor None, and
+        timestamps that are not integer microseconds, go to the extras
+        column in their to_json form.
+        """
+        names = [name for name in cls.ATTRIBUTES
+                 if name not in Base.ATTRIBUTES]
+        ids, extras = [], []
+        created, updated = array('q'), array('q')
+        columns = {name: [] for name in names}
+        for obj in DATA[cls.__name__].values():
+            ids.append(obj.id)
+            extra = {}
+            for name, micros in (('created_at', created),
+                                 ('updated_at', updated)):
+                value = getattr(obj, '_' + name, _MISSING)
+                if type(value) is int:
+                    micros.append(value)
+                    continue
+                micros.append(NO_TIMESTAMP)
+                if value is not _MISSING:
+                    extra[name] = value
+            for name in names:
+                value = getattr(obj, name, _MISSING)
+                if value is None or type(value) is str:
+                    columns[name].append(value)
+                    continue
+                columns[name].append(MISSING)
+                if value is not _MISSING:
+                    extra[name] = value
+            for name, value in extra.items():
+                if type(value) is datetime:
+                    extra[name] = value.strftime(TIMESTAMP_FORMAT)
+            extras.append(extra or None)
+        return ids, created, updated, columns, extras
+
+    @classmethod
+    def _binary_loader(cls, snapshot: BinarySnapshot,
+                       decode: bool) -> Callable[[int], 'Base']:
+        """ Return a function building the object of a snapshot record,
+        decoding all the columns first if `decode`
+
+        Objects are built without __init__: slots are set from the columns
+        and declared attributes missing from the snapshot are None, like
+        cls(**obj_json) leaves them. A subclass whose __init__ does more
+        must override this.
+        """
+        columns = []
+        for name in cls.ATTRIBUTES:
+            if name in Base.ATTRIBUTES:
+                continue
+            column = snapshot.columns.get(name)
+            if decode and column is not None:
+                column = column.decode()
+            columns.append((name, column))
+        extras = snapshot.extras.decode() if decode else snapshot.extras
+        ids, created, updated = snapshot.ids, snapshot.created, \
+            snapshot.updated
+        new = cls.__new__
+
+        def load(index: int) -> Base:
+            """ Build the object of a record
+            """
+            obj = new(cls)
+            obj._json_cache = None
+            obj.id = ids[index]
+            obj._created_at = created[index]
+            obj._updated_at = updated[index]
+            for name, values in columns:
+                value = None if values is None else values[index]
+                if value is not MISSING:
+                    setattr(obj, name, value)
+            if extras[index] is not None:
+                for name, value in json.loads(extras[index]).items():
+                    if name in ('created_at', 'updated_at'):
+                        value = _parse_timestamp(value)
+                    setattr(obj, name, value)
+            if obj._created_at == NO_TIMESTAMP:
+                obj.created_at = datetime.utcnow()
+            if obj._updated_at == NO_TIMESTAMP:
+                obj.updated_at = datetime.utcnow()
+            return obj
+
+        return load
+
+    @classmethod
+    def _journal(cls) -> Journal:
+        """ Return the journal of the class
+        """
+        s_class = cls.__name__
+        if JOURNALS.get(s_class) is None:
+            JOURNALS[s_class] = Journal(".db_{}.json".format(s_class))
+        return JOURNALS[s_class]
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        if self._coherent():
+            with self._file_lock(True):
+                self.__class__._reload_changes()
+                self._save()
+        else:
+            self._save()
+
+    def _save(self):
+        """ Save current object to DATA and to storage
+        """
+        with self._lock().write():
+            self.updated_at = datetime.utcnow()
+            self._json_cache = None
+            self._store()
+            if STORAGE_MODE == "journal":
+                self._journal().save(self.id, self.to_json(True))
+                return
+        if STORAGE_MODE == "write_behind":
+            WRITE_BEHIND.mark_dirty(self.__class__)
+        else:
+            self.__class__.save_to_file()
 
     def remove(self):
         """ Remove object
         """
+        if self._coherent():
+            with self._file_lock(True):
+                self.__class__._reload_changes()
+                self._remove()
+        else:
+            self._remove()
+
+    def _remove(self):
+        """ Remove object from DATA and from storage
+        """
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
+        with self._lock().write():
+            if DATA[s_class].get(self.id) is None:
+                return
+            self._unstore()
+            if STORAGE_MODE == "journal":
+                self._journal().remove(self.id)
+                return
+        if STORAGE_MODE == "write_behind":
+            WRITE_BEHIND.mark_dirty(self.__class__)
+        else:
             self.__class__.save_to_file()
 
+    @classmethod
+    def save_batch(cls, saved: Iterable[TypeVar('Base')] = (),
+                   removed: Iterable[TypeVar('Base')] = ()):
+        """ Save and remove many objects with one write to storage
+        """
+        if cls._coherent():
+            with cls._file_lock(True):
+                cls._reload_changes()
+                cls._save_batch(saved, removed)
+        else:
+            cls._save_batch(saved, removed)
+
+    @classmethod
+    def _save_batch(cls, saved: Iterable[TypeVar('Base')],
+                    removed: Iterable[TypeVar('Base')]):
+        """ Save objects to DATA, remove others from DATA, then write the
+        changes to storage
+        """
+        s_class = cls.__name__
+        saved = list(saved)
+        removed_ids = []
+        with cls._lock().write():
+            for obj in saved:
+                obj.updated_at = datetime.utcnow()
+                obj._json_cache = None
+                obj._store()
+            for obj in removed:
+                if DATA[s_class].get(obj.id) is None:
+                    continue
+                obj._unstore()
+                removed_ids.append(obj.id)
+            if len(saved) == 0 and len(removed_ids) == 0:
+                return
+            if STORAGE_MODE == "journal":
+                cls._journal().batch(
+                    [(obj.id, obj.to_json(True)) for obj in saved],
+                    removed_ids)
+                return
+        if STORAGE_MODE == "write_behind":
+            WRITE_BEHIND.mark_dirty(cls)
+        else:
+            cls.save_to_file()
+
+    def _store(self):
+        """ Put the object in DATA and the indexes, called with the write
+        lock held
+        """
+        s_class = self.__class__.__name__
+        if self.id not in DATA[s_class]:
+            insort(SORTED_IDS[s_class], self.id)
+            COUNTERS[s_class].create()
+        else:
+            COUNTERS[s_class].update()
+        DATA[s_class][self.id] = self
+        self._index()
+
+    def _unstore(self):
+        """ Take the object with the same id out of DATA and the indexes,
+        called with the write lock held
+        """
+        s_class = self.__class__.__name__
+        del DATA[s_class][self.id]
+        COUNTERS[s_class].delete()
+        ids = SORTED_IDS[s_class]
+        position = bisect_left(ids, self.id)
+        if position < len(ids) and ids[position] == self.id:
+            del ids[position]
+        self._unindex()
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Empty the indexes of the class
+        """
+        s_class = cls.__name__
+        INDEXES[s_class] = {attr: {} for attr in cls.INDEXED_ATTRIBUTES}
+        INDEXED_VALUES[s_class] = {}
+        SORTED_IDS[s_class] = []
+        SORTED_INDEXES[s_class] = {attr: [] for attr in cls.SORTED_ATTRIBUTES}
+        SORTED_VALUES[s_class] = {}
+        SORTED_STALE[s_class] = False
+
+    def _index(self):
+        """ Add or refresh the object in the indexes of its class
+        """
+        s_class = self.__class__.__name__
+        self._unindex()
+        values = {}
+        for attr, index in INDEXES[s_class].items():
+            value = getattr(self, attr, None)
+            try:
+                index.setdefault(value, {})[self.id] = self
+            except TypeError:
+                continue
+            values[attr] = value
+        INDEXED_VALUES[s_class][self.id] = values
+        if SORTED_STALE[s_class]:
+            return
+        values = {}
+        for attr, entries in SORTED_INDEXES[s_class].items():
+            value = getattr(self, attr, None)
+            if value is None:
+                continue
+            try:
+                insort(entries, (value, self.id))
+            except TypeError:
+                continue
+            values[attr] = value
+        SORTED_VALUES[s_class][self.id] = values
+
+    def _unindex(self):
+        """ Remove the object from the indexes of its class
+        """
+        s_class = self.__class__.__name__
+        values = INDEXED_VALUES[s_class].pop(self.id, None)
+        if values is not None:
+            for attr, value in values.items():
+                objs = INDEXES[s_class][attr][value]
+                objs.pop(self.id, None)
+                if len(objs) == 0:
+                    del INDEXES[s_class][attr][value]
+        values = SORTED_VALUES[s_class].pop(self.id, None)
+        if values is None:
+            return
+        for attr, value in values.items():
+            entries = SORTED_INDEXES[s_class][attr]
+            position = bisect_left(entries, (value, self.id))
+            if position < len(entries) and \
+               entries[position] == (value, self.id):
+                del entries[position]
+
+    @classmethod
+    def _rebuild_sorted_indexes(cls):
+        """ Sort all objects at once into the sorted indexes after a load,
+        called with the write lock held
+        """
+        s_class = cls.__name__
+        objs = list(DATA[s_class].values())
+        SORTED_STALE[s_class] = False
+        SORTED_VALUES[s_class] = {obj.id: {} for obj in objs}
+        for attr in cls.SORTED_ATTRIBUTES:
+            entries = []
+            for obj in objs:
+                value = getattr(obj, attr, None)
+                if value is not None:
+                    entries.append((value, obj.id))
+            try:
+                entries.sort()
+            except TypeError:
+                # values that don't compare are left out, like in _index
+                entries, unsorted = [], entries
+                for entry in unsorted:
+                    try:
+                        insort(entries, entry)
+                    except TypeError:
+                        pass
+            SORTED_INDEXES[s_class][attr] = entries
+            for value, obj_id in entries:
+                SORTED_VALUES[s_class][obj_id][attr] = value
+
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        cls._refresh()
+        return len(DATA[s_class])
+
+    @classmethod
+    def stats(cls) -> dict:
+        """ Return the number of objects, the mutation counters and the
+        size of the storage files, without reading the store
+        """
+        s_class = cls.__name__
+        cls._lock()
+        stats = COUNTERS[s_class].to_json()
+        stats['count'] = len(DATA.get(s_class, {}))
+        file_paths = [cls._snapshot_path()]
+        if STORAGE_MODE == "journal":
+            journal = cls._journal()
+            file_paths += [journal.journal_path, journal.compacting_path]
+        stats['store_size'] = 0
+        for file_path in file_paths:
+            try:
+                stats['store_size'] += os.stat(file_path).st_size
+            except FileNotFoundError:
+                pass
+        return stats
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -114,11 +719,69 @@ class Base():
         """
         return cls.search()
 
+    @classmethod
+    def page(cls, after: str = None,
+             limit: int = None) -> List[TypeVar('Base')]:
+        """ Return up to limit objects ordered by ID, starting after the
+        ID `after`
+        """
+        s_class = cls.__name__
+        cls._refresh()
+        with cls._lock().read():
+            ids = SORTED_IDS[s_class]
+            start = 0 if after is None else bisect_right(ids, after)
+            end = len(ids) if limit is None else start + limit
+            return [DATA[s_class][obj_id] for obj_id in ids[start:end]]
+
+    @classmethod
+    def query(cls, attribute: str, prefix: str = None, start=None,
+              end=None, limit: int = None,
+              reverse: bool = False) -> List[TypeVar('Base')]:
+        """ Return the objects ordered by a SORTED_ATTRIBUTES attribute,
+        optionally only values starting with `prefix` and in the range
+        start <= value < end, at most `limit` of them
+
+        Objects where the attribute is None are left out. Without any
+        bound, this iterates over all objects in order.
+        """
+        s_class = cls.__name__
+        if attribute not in cls.SORTED_ATTRIBUTES:
+            raise ValueError("{} is not a sorted attribute of {}"
+                             .format(attribute, s_class))
+        cls._refresh()
+        lock = cls._lock()
+        if SORTED_STALE[s_class]:
+            with lock.write():
+                if SORTED_STALE[s_class]:
+                    cls._rebuild_sorted_indexes()
+        with lock.read():
+            entries = SORTED_INDEXES[s_class][attribute]
+            low, high = 0, len(entries)
+            if start is not None:
+                low = max(low, bisect_left(entries, (start,)))
+            if end is not None:
+                high = min(high, bisect_left(entries, (end,)))
+            if prefix is not None:
+                low = max(low, bisect_left(entries, (prefix,)))
+                prefix_end = _prefix_end(prefix)
+                if prefix_end is not None:
+                    high = min(high, bisect_left(entries, (prefix_end,)))
+            if limit is not None and high - low > limit:
+                if reverse:
+                    low = high - limit
+                else:
+                    high = low + limit
+            selected = entries[low:max(low, high)]
+            if reverse:
+                selected.reverse()
+            return [DATA[s_class][obj_id] for _, obj_id in selected]
+
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
         s_class = cls.__name__
+        cls._refresh()
         return DATA[s_class].get(id)
 
     @classmethod
@@ -133,5 +796,19 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        cls._refresh()
+        with cls._lock().read():
+            indexes = INDEXES.get(s_class, {})
+            for k, v in attributes.items():
+                if k not in indexes:
+                    continue
+                if isinstance(DATA[s_class], LazyObjects):
+                    DATA[s_class].materialize_all()
+                try:
+                    objs = indexes[k].get(v, {})
+                except TypeError:
+                    break
+                return list(filter(_search, list(objs.values())))
+
+            return list(filter(_search, list(DATA[s_class].values())))
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+""" Coherence module
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+import os
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def file_signature(file_path: str) -> Optional[Tuple[int, int, int]]:
+    """ Return what identifies a version of a file: inode, size and
+    modification time, or None if it doesn't exist
+    """
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+@contextmanager
+def file_lock(lock_path: str, exclusive: bool) -> Iterator[None]:
+    """ Hold an advisory lock shared between processes for the duration of
+    a with block, a no-op where fcntl isn't available
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
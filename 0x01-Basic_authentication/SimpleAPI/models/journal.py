@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+""" Journal module
+"""
+from os import path
+from typing import List, Tuple
+import json
+import os
+import threading
+
+
+COMPACT_THRESHOLD = 1000
+
+
+class Journal():
+    """ Append-only log of the mutations of one class
+
+    Each save or remove appends one JSON line. Once the journal holds
+    COMPACT_THRESHOLD records, it is moved aside and a background thread
+    folds it into the snapshot file.
+    """
+
+    def __init__(self, snapshot_path: str,
+                 compact_threshold: int = COMPACT_THRESHOLD):
+        """ Initialize a Journal for a snapshot file
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path[:-len(".json")] + ".journal"
+        self.compacting_path = self.journal_path + ".compacting"
+        self.compact_threshold = compact_threshold
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compacting = None
+
+    def append(self, record: dict):
+        """ Append one mutation record
+        """
+        self.append_many([record])
+
+    def append_many(self, records: List[dict]):
+        """ Append mutation records with a single write
+        """
+        lines = "".join([json.dumps(record) + "\n" for record in records])
+        with self._lock:
+            if self._file is None:
+                _truncate_torn_line(self.journal_path)
+                self._file = open(self.journal_path, 'a')
+            self._file.write(lines)
+            self._file.flush()
+            self.count += len(records)
+            if self.count >= self.compact_threshold:
+                self._rotate()
+
+    def save(self, obj_id: str, obj_json: dict):
+        """ Append the new state of an object
+        """
+        self.append({"op": "save", "id": obj_id, "obj": obj_json})
+
+    def remove(self, obj_id: str):
+        """ Append the removal of an object
+        """
+        self.append({"op": "remove", "id": obj_id})
+
+    def batch(self, saved: List[Tuple[str, dict]], removed: List[str]):
+        """ Append the new states of objects, as (id, JSON) pairs, then the
+        removals of objects, with a single write
+        """
+        records = [{"op": "save", "id": obj_id, "obj": obj_json}
+                   for obj_id, obj_json in saved]
+        records += [{"op": "remove", "id": obj_id} for obj_id in removed]
+        self.append_many(records)
+
+    def _rotate(self):
+        """ Move the journal aside and compact it in the background,
+        called with the lock held
+        """
+        if self._compacting is not None and self._compacting.is_alive():
+            return
+        if path.exists(self.compacting_path):
+            # left by a crash: fold it first, rotate on a later append
+            self._start_compaction()
+            return
+        self._file.close()
+        self._file = None
+        os.replace(self.journal_path, self.compacting_path)
+        self.count = 0
+        self._start_compaction()
+
+    def _start_compaction(self):
+        """ Compact the moved aside journal in a background thread, called
+        with the lock held
+        """
+        self._compacting = threading.Thread(target=self.compact,
+                                            daemon=True)
+        self._compacting.start()
+
+    def compact(self):
+        """ Fold the moved aside journal into the snapshot file
+        """
+        with self._compact_lock:
+            if not path.exists(self.compacting_path):
+                return
+            objs_json = _read_snapshot(self.snapshot_path)
+            _replay(self.compacting_path, objs_json)
+            write_json_file(self.snapshot_path, objs_json)
+            os.remove(self.compacting_path)
+
+    def read_state(self) -> dict:
+        """ Return the objects JSON of the snapshot with both journals
+        replayed on top
+        """
+        with self._compact_lock, self._lock:
+            objs_json = _read_snapshot(self.snapshot_path)
+            _replay(self.compacting_path, objs_json)
+            self.count = _replay(self.journal_path, objs_json)
+            if path.exists(self.compacting_path) and \
+               (self._compacting is None or not self._compacting.is_alive()):
+                self._start_compaction()
+        return objs_json
+
+    def write_snapshot(self, objs_json: dict):
+        """ Replace the snapshot with a full state and empty the journals
+        """
+        with self._compact_lock, self._lock:
+            write_json_file(self.snapshot_path, objs_json)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for file_path in (self.journal_path, self.compacting_path):
+                if path.exists(file_path):
+                    os.remove(file_path)
+            self.count = 0
+
+
+def _read_snapshot(file_path: str) -> dict:
+    """ Return the objects JSON of a snapshot file
+    """
+    if not path.exists(file_path):
+        return {}
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def write_json_file(file_path: str, objs_json: dict, fsync: bool = False):
+    """ Atomically replace a snapshot file, optionally forcing it to disk
+    """
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(objs_json, f)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+def _truncate_torn_line(file_path: str):
+    """ Cut a journal file back to its last complete line, so the next
+    append doesn't extend a line torn by a crash
+    """
+    if not path.exists(file_path):
+        return
+    with open(file_path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            chunk = f.read(position - start)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+def _replay(file_path: str, objs_json: dict) -> int:
+    """ Apply the records of a journal file, return how many were read
+
+    A torn line, left by a crash during an append, is skipped, and cut
+    off before the next append.
+    """
+    if not path.exists(file_path):
+        return 0
+    count = 0
+    with open(file_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record["op"] == "save":
+                objs_json[record["id"]] = record["obj"]
+            else:
+                objs_json.pop(record["id"], None)
+            count += 1
+    return count
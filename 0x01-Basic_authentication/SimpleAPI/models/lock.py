@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Lock module
+"""
+from contextlib import contextmanager
+from typing import Iterator
+import threading
+
+
+class ReadWriteLock():
+    """ Many readers or one writer, waiting writers block new readers so
+    they are not starved
+    """
+
+    def __init__(self):
+        """ Initialize a ReadWriteLock
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """ Hold the lock shared for the duration of a with block
+        """
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """ Hold the lock exclusively for the duration of a with block
+        """
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+""" Binary snapshot module
+
+Records are stored column by column, integers are little-endian:
+  - header: magic b"HBDB", version (u16), flags (u16), count (u32),
+    size of the names block (u32)
+  - names block: JSON list of the names of the attribute columns
+  - created_at and updated_at columns: count i64 each, microseconds since
+    the epoch, NO_TIMESTAMP if the value is in the extras column
+  - ids column, one column per name, then the extras column, each one a
+    string column: count kinds (u8), count + 1 offsets (u64), then the
+    UTF-8 text of the STRING values, value i spanning offsets[i] to
+    offsets[i + 1]
+  - extras column: JSON object of the values that are neither strings nor
+    integer timestamps, NULL for most records
+
+Loading a record only slices its text out of the columns, there is no JSON
+or timestamp to parse.
+"""
+from array import array
+from itertools import islice
+from typing import Callable, Iterable, List
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+
+MAGIC = b"HBDB"
+VERSION = 2
+HEADER = struct.Struct("<4sHHII")
+# kinds of the values of a string column
+STRING = 0
+NULL = 1
+ABSENT = 2
+# value of ABSENT entries, when writing and reading
+MISSING = object()
+NO_TIMESTAMP = -2 ** 63
+
+
+def _little_endian(values: array) -> bytes:
+    """ Return the bytes of an integer array in little-endian order
+    """
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _pack_strings(values: Iterable) -> List[bytes]:
+    """ Encode a string column of str, None or MISSING values
+    """
+    kinds = bytearray()
+    offsets = array('Q', [0])
+    chunks = []
+    end = 0
+    for value in values:
+        if value is None:
+            kinds.append(NULL)
+        elif value is MISSING:
+            kinds.append(ABSENT)
+        else:
+            kinds.append(STRING)
+            chunk = value.encode('utf-8', 'surrogatepass')
+            chunks.append(chunk)
+            end += len(chunk)
+        offsets.append(end)
+    return [bytes(kinds), _little_endian(offsets), b"".join(chunks)]
+
+
+def write_binary_snapshot(file_path: str, ids: List[str], created: array,
+                          updated: array, columns: dict, extras: List[dict],
+                          fsync: bool = False):
+    """ Atomically replace a binary snapshot file
+
+    created and updated hold an i64 per record, columns map attribute names
+    to their list of values and extras hold a dictionary or None per record
+    """
+    names = json.dumps(list(columns)).encode()
+    extras = [None if extra is None else
+              json.dumps(extra, separators=(',', ':')) for extra in extras]
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(ids), len(names)))
+        f.write(names)
+        f.write(_little_endian(created))
+        f.write(_little_endian(updated))
+        for values in [ids] + list(columns.values()) + [extras]:
+            f.writelines(_pack_strings(values))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+class StringColumn():
+    """ String column of a mapped snapshot, values are decoded on demand
+    """
+
+    def __init__(self, buffer: mmap.mmap, start: int, count: int):
+        """ Read the kinds and offsets of a column starting at `start`
+        """
+        self._buffer = buffer
+        self._kinds = buffer[start:start + count]
+        start += count
+        self._offsets = array('Q')
+        size = (count + 1) * self._offsets.itemsize
+        self._offsets.frombytes(buffer[start:start + size])
+        if sys.byteorder != "little":
+            self._offsets.byteswap()
+        self._text = start + size
+        self.end = self._text + self._offsets[count]
+
+    def __getitem__(self, index: int):
+        """ Return one value: a str, None or MISSING
+        """
+        kind = self._kinds[index]
+        if kind != STRING:
+            return None if kind == NULL else MISSING
+        start = self._text + self._offsets[index]
+        end = self._text + self._offsets[index + 1]
+        return str(self._buffer[start:end], 'utf-8', 'surrogatepass')
+
+    def decode(self) -> list:
+        """ Return all values, decoding the text of the column at once
+        """
+        text = self._buffer[self._text:self.end]
+        bounds = zip(self._offsets, islice(self._offsets, 1, None))
+        if text.isascii():
+            # byte offsets are also character offsets
+            text = text.decode('ascii')
+            values = [text[start:end] for start, end in bounds]
+        else:
+            values = [str(text[start:end], 'utf-8', 'surrogatepass')
+                      for start, end in bounds]
+        if self._kinds.count(STRING) != len(values):
+            values = [value if kind == STRING else
+                      None if kind == NULL else MISSING
+                      for kind, value in zip(self._kinds, values)]
+        return values
+
+
+class BinarySnapshot():
+    """ Memory mapped binary snapshot
+    """
+
+    def __init__(self, file_path: str):
+        """ Map a snapshot file, then read its header, ids and the position
+        of its columns
+        """
+        with open(file_path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, names_size = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError("{} is not a binary snapshot".format(file_path))
+        if version != VERSION:
+            raise ValueError("Unsupported snapshot version {}".format(version))
+        self.count = count
+        start = HEADER.size
+        names = json.loads(self._map[start:start + names_size])
+        start += names_size
+        self.created, start = self._integers(start)
+        self.updated, start = self._integers(start)
+        ids = StringColumn(self._map, start, count)
+        self.ids = ids.decode()
+        start = ids.end
+        self.columns = {}
+        for name in names:
+            self.columns[name] = StringColumn(self._map, start, count)
+            start = self.columns[name].end
+        self.extras = StringColumn(self._map, start, count)
+
+    def _integers(self, start: int) -> tuple:
+        """ Return the i64 column at `start` and the position after it
+        """
+        values = array('q')
+        end = start + self.count * values.itemsize
+        values.frombytes(self._map[start:end])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values, end
+
+
+class LazyObjects(dict):
+    """ Objects of a class keyed by id, each built on first access
+
+    Ids not accessed yet are kept in `_pending` with their record index,
+    `load` builds the object of a record index. Building is serialized by
+    a lock, so concurrent readers never build an object twice.
+    """
+
+    def __init__(self, ids: List[str], load: Callable):
+        """ Initialize with the ids of a snapshot
+        """
+        super().__init__()
+        self._pending = dict(zip(ids, range(len(ids))))
+        self._load = load
+        self._lock = threading.RLock()
+
+    def _materialize(self, key):
+        """ Build the object of a pending id
+        """
+        with self._lock:
+            index = self._pending.get(key)
+            if index is None:
+                return super().__getitem__(key)
+            obj = self._load(index)
+            super().__setitem__(key, obj)
+            del self._pending[key]
+            return obj
+
+    def materialize_all(self):
+        """ Build every pending object
+        """
+        with self._lock:
+            for key in list(self._pending):
+                self._materialize(key)
+
+    def __getitem__(self, key):
+        """ Return an object, building it if pending
+        """
+        if key in self._pending:
+            return self._materialize(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        """ Return an object or default, building it if pending
+        """
+        if key in self._pending:
+            return self._materialize(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        """ Store an object, replacing a pending one
+        """
+        with self._lock:
+            self._pending.pop(key, None)
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        """ Delete an object, pending or not
+        """
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                super().pop(key, None)
+                return
+            super().__delitem__(key)
+
+    def pop(self, key, *default):
+        """ Remove and return an object, building it if pending
+        """
+        if key in self._pending:
+            self._materialize(key)
+        return super().pop(key, *default)
+
+    def __contains__(self, key) -> bool:
+        """ Membership of built and pending ids
+        """
+        return key in self._pending or super().__contains__(key)
+
+    def __len__(self) -> int:
+        """ Number of built and pending objects
+        """
+        return len(self._pending) + super().__len__()
+
+    def __iter__(self):
+        """ Iterate over built and pending ids
+        """
+        return iter(self.keys())
+
+    def keys(self) -> Iterable:
+        """ Return built and pending ids
+        """
+        return list(super().keys()) + list(self._pending)
+
+    def values(self) -> Iterable:
+        """ Return all objects, building the pending ones
+        """
+        self.materialize_all()
+        return super().values()
+
+    def items(self) -> Iterable:
+        """ Return all (id, object) pairs, building the pending ones
+        """
+        self.materialize_all()
+        return super().items()
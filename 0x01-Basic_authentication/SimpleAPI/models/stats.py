@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+""" Stats module
+"""
+from os import getenv
+import threading
+import time
+
+
+STATS_INTERVAL = float(getenv("MODELS_STATS_INTERVAL", "60"))
+
+
+class Counters():
+    """ Mutation counters of one class
+
+    Totals since the process started, plus the creations and deletions of
+    the last complete interval of `interval` seconds. Each update is O(1).
+    """
+
+    def __init__(self, interval: float = STATS_INTERVAL):
+        """ Initialize Counters
+        """
+        self.interval = interval
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._current = [0, 0]
+        self._previous = [0, 0]
+
+    def _roll(self):
+        """ Start a new interval if the current one is over, called with
+        the lock held
+        """
+        elapsed = time.monotonic() - self._start
+        if elapsed < self.interval:
+            return
+        intervals = int(elapsed // self.interval)
+        self._previous = self._current if intervals == 1 else [0, 0]
+        self._current = [0, 0]
+        self._start += intervals * self.interval
+
+    def create(self):
+        """ Count the creation of an object
+        """
+        with self._lock:
+            self._roll()
+            self.created += 1
+            self._current[0] += 1
+
+    def update(self):
+        """ Count the update of an object
+        """
+        with self._lock:
+            self.updated += 1
+
+    def delete(self):
+        """ Count the deletion of an object
+        """
+        with self._lock:
+            self._roll()
+            self.deleted += 1
+            self._current[1] += 1
+
+    def to_json(self) -> dict:
+        """ Return the counters as a JSON dictionary
+        """
+        with self._lock:
+            self._roll()
+            return {
+                'created': self.created,
+                'updated': self.updated,
+                'deleted': self.deleted,
+                'interval': self.interval,
+                'created_last_interval': self._previous[0],
+                'deleted_last_interval': self._previous[1],
+            }
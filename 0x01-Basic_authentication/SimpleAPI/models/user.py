@@ -9,6 +9,11 @@ class User(Base):
     """ User class
     """
 
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    ATTRIBUTES = Base.ATTRIBUTES + __slots__
+    INDEXED_ATTRIBUTES = ('email',)
+    SORTED_ATTRIBUTES = ('email', 'created_at')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Write-behind module
+"""
+from os import getenv
+import atexit
+import logging
+import threading
+
+
+FLUSH_INTERVAL = float(getenv("MODELS_FLUSH_INTERVAL", "1.0"))
+FLUSH_THRESHOLD = int(getenv("MODELS_FLUSH_THRESHOLD", "1000"))
+logger = logging.getLogger(__name__)
+
+
+class WriteBehind():
+    """ Group commit of model classes
+
+    Mutations only mark their class dirty. A background thread saves the
+    dirty classes every `interval` seconds, or as soon as `threshold`
+    mutations are pending, so a burst of saves costs one file write.
+    """
+
+    def __init__(self, interval: float = FLUSH_INTERVAL,
+                 threshold: int = FLUSH_THRESHOLD):
+        """ Initialize a WriteBehind
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self._dirty = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def mark_dirty(self, cls):
+        """ Record a mutation of a class
+        """
+        with self._cond:
+            self._dirty[cls.__name__] = cls
+            self._pending += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+            if self._pending >= self.threshold:
+                self._cond.notify()
+
+    def flush(self):
+        """ Save every dirty class now
+
+        A class that fails to save stays dirty to be retried on the next
+        flush, the first error is raised once the others are saved.
+        """
+        with self._flush_lock:
+            with self._cond:
+                dirty, self._dirty = self._dirty, {}
+                self._pending = 0
+            error = None
+            for s_class, cls in dirty.items():
+                try:
+                    cls.save_to_file()
+                except Exception as e:
+                    with self._cond:
+                        self._dirty.setdefault(s_class, cls)
+                    if error is None:
+                        error = e
+            if error is not None:
+                raise error
+
+    def _run(self):
+        """ Flush on every interval or when the threshold is reached
+        """
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending >= self.threshold,
+                                    timeout=self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed, will retry")
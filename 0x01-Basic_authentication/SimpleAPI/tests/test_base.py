@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" Tests of the base module
+"""
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from models.user import User
+
+
+class TestToJsonStr(unittest.TestCase):
+    """ Tests of Base.to_json_str
+    """
+
+    def setUp(self):
+        """ Work in an empty directory
+        """
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        User.load_from_file()
+
+    def tearDown(self):
+        """ Go back to the original directory
+        """
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_concurrent_save_discards_old_fragment(self):
+        """ A fragment encoded while a save is pending is not served after
+        the save
+        """
+        user = User(email="old@example.com")
+        user.save()
+        encoding = threading.Event()
+        resume = threading.Event()
+        to_json = User.to_json
+
+        def slow_to_json(obj, *args, **kwargs):
+            """ Encode the attributes, then let the reader wait for the
+            save to start
+            """
+            result = to_json(obj, *args, **kwargs)
+            if threading.current_thread() is reader:
+                encoding.set()
+                resume.wait(5)
+            return result
+
+        with patch.object(User, 'to_json', slow_to_json):
+            reader = threading.Thread(target=user.to_json_str)
+            reader.start()
+            encoding.wait(5)
+            user.email = "new@example.com"
+            writer = threading.Thread(target=user.save)
+            writer.start()
+            # lets an unguarded save clear the cache before the reader
+            # stores its fragment
+            writer.join(0.5)
+            resume.set()
+            reader.join(5)
+            writer.join(5)
+        self.assertIn("new@example.com", user.to_json_str())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+""" Tests of the journal module
+"""
+import os
+import tempfile
+import unittest
+from models.journal import Journal
+
+
+class TestJournal(unittest.TestCase):
+    """ Tests of Journal
+    """
+
+    def setUp(self):
+        """ Work in an empty directory
+        """
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        """ Go back to the original directory
+        """
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_saves_after_torn_line_survive(self):
+        """ Appends after a crash mid-append are not merged into the torn
+        line, so they are all read back
+        """
+        journal = Journal(".db_User.json")
+        journal.save("first", {"id": "first"})
+        journal._file.close()
+        with open(journal.journal_path, 'a') as f:
+            f.write('{"op": "save", "id": "torn", "obj": {"i')
+
+        journal = Journal(".db_User.json")
+        self.assertEqual(list(journal.read_state()), ["first"])
+        journal.save("after-crash", {"id": "after-crash"})
+        journal.save("after-crash-2", {"id": "after-crash-2"})
+        journal._file.close()
+
+        journal = Journal(".db_User.json")
+        self.assertEqual(sorted(journal.read_state()),
+                         ["after-crash", "after-crash-2", "first"])
+
+
+if __name__ == "__main__":
+    unittest.main()
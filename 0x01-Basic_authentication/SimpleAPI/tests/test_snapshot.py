@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+""" Tests of the binary snapshot format
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from models import base
+from models.base import DATA
+from models.user import User
+
+
+class TestBinarySnapshot(unittest.TestCase):
+    """ Tests of saving and loading binary snapshots
+    """
+
+    def setUp(self):
+        """ Work in an empty directory with binary snapshots
+        """
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.settings = (base.SNAPSHOT_FORMAT, base.LAZY_LOAD)
+        base.SNAPSHOT_FORMAT = "binary"
+        DATA['User'] = {}
+        User._reset_indexes()
+
+    def tearDown(self):
+        """ Restore the settings and go back to the original directory
+        """
+        base.SNAPSHOT_FORMAT, base.LAZY_LOAD = self.settings
+        DATA['User'] = {}
+        User._reset_indexes()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def users(self) -> list:
+        """ Store and save users covering each kind of value
+        """
+        plain = User(email="plain@example.com", first_name="Plain")
+        plain.password = "pwd"
+        other = User(email="été@example.com", first_name=12,
+                     last_name="\udc80")
+        other.created_at = datetime(2020, 1, 2, 3, 4, 5,
+                                    tzinfo=timezone.utc)
+        users = [plain, other]
+        User.save_batch(users)
+        return users
+
+    def assertLoaded(self, users: list):
+        """ Check the loaded users serialize like the saved ones
+        """
+        self.assertEqual(User.count(), len(users))
+        for user in users:
+            self.assertEqual(User.get(user.id).to_json(True),
+                             user.to_json(True))
+        self.assertEqual(User.search({'email': users[0].email}),
+                         [User.get(users[0].id)])
+
+    def test_round_trip(self):
+        """ Every value is read back the way it was saved
+        """
+        users = self.users()
+        base.LAZY_LOAD = False
+        User.load_from_file()
+        self.assertIsNot(User.get(users[0].id), users[0])
+        self.assertLoaded(users)
+        self.assertEqual(User.get(users[0].id).created_at,
+                         users[0].created_at)
+
+    def test_lazy_round_trip(self):
+        """ Lazily loaded objects match the saved ones
+        """
+        users = self.users()
+        base.LAZY_LOAD = True
+        User.load_from_file()
+        self.assertLoaded(users)
+
+    def test_reload_changes(self):
+        """ Only the objects changed by another process are replaced
+        """
+        users = self.users()
+        shutil.copy(".db_User.bin", "before.bin")
+        users[1].last_name = "Changed"
+        User.save_batch(users[1:])
+        shutil.copy(".db_User.bin", "after.bin")
+
+        os.replace("before.bin", ".db_User.bin")
+        User.load_from_file()
+        unchanged = User.get(users[0].id)
+        os.replace("after.bin", ".db_User.bin")
+        base.SIGNATURES['User'] = None
+        User._reload_changes()
+        self.assertIs(User.get(users[0].id), unchanged)
+        self.assertEqual(User.get(users[1].id).last_name, "Changed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,6 +6,8 @@ from os import getenv
 from api.v1.views import app_views
 from flask import Flask, jsonify, abort, request
 from flask_cors import (CORS, cross_origin)
+from typing import List, Pattern
+import re
 
 app = Flask(__name__)
 app.register_blueprint(app_views)
@@ -21,6 +23,30 @@ elif getenv("AUTH_TYPE") == "basic_auth":
 elif getenv("AUTH_TYPE") == "session_auth":
     from api.v1.auth.session_auth import SessionAuth  # Import SessionAuth
     auth = SessionAuth()  # Create a SessionAuth instance
+elif getenv("AUTH_TYPE") == "session_db_auth":
+    from api.v1.auth.session_db_auth import SessionDBAuth
+    auth = SessionDBAuth()
+
+
+def compile_paths(paths: List[str]) -> Pattern:
+    """Compiles paths into one regex matching any of them, with or without
+    a trailing slash, a '*' matching any characters"""
+    patterns = []
+    for path in paths:
+        if path.endswith('*'):
+            pattern = '.*'.join(map(re.escape, path.split('*')))
+        else:
+            pattern = '.*'.join(map(re.escape, path.rstrip('/').split('*')))
+            pattern += '/?'
+        patterns.append(pattern)
+    return re.compile('|'.join(patterns) if patterns else '(?!)')
+
+
+excluded_paths = compile_paths([
+    '/api/v1/status/',
+    '/api/v1/unauthorized/',
+    '/api/v1/forbidden/',
+])
 
 
 @app.errorhandler(404)
@@ -32,20 +58,16 @@ def not_found(error) -> str:
 
 @app.before_request
 def before_request():
-    """Before request handler."""
-    if auth:
-        excluded_paths = [
-            '/api/v1/status/',
-            '/api/v1/unauthorized/',
-            '/api/v1/forbidden/',
-        ]
-        if auth.require_auth(request.path, excluded_paths):
-            if not auth.authorization_header(request) and \
-                    not auth.session_cookie(request):
-                abort(401)
-            if not auth.current_user(request):
-                abort(403)
-        request.current_user = auth.current_user(request)
+    """Before request handler, resolves request.current_user once."""
+    request.current_user = None
+    if auth is None or excluded_paths.fullmatch(request.path):
+        return
+    if not auth.authorization_header(request) and \
+            not auth.session_cookie(request):
+        abort(401)
+    request.current_user = auth.current_user(request)
+    if not request.current_user:
+        abort(403)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Module for basic authentication
+"""
+from api.v1.auth.auth import Auth
+from collections import OrderedDict
+from models.user import User
+from os import getenv
+from typing import Tuple
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+
+def env_number(name: str, default: float) -> float:
+    """Reads a number environment variable, default if unset or invalid"""
+    try:
+        return float(getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class CredentialsCache:
+    """Bounded cache of Authorization headers already verified.
+
+    Headers are keyed by their HMAC under a random per-process key, so no
+    credentials are kept. An entry maps to the resolved User and lasts
+    `ttl` seconds; it is dropped as soon as the user is removed or its
+    password changes. At most `max_entries` are kept, the least recently
+    used one is evicted first.
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        """Initializes an empty CredentialsCache"""
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._key = os.urandom(32)
+        # digest -> (User, password hash, expiry time), oldest use first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, authorization_header: str) -> bytes:
+        """Returns the cache key of an Authorization header"""
+        return hmac.new(self._key, authorization_header.encode(),
+                        hashlib.sha256).digest()
+
+    def get(self, digest: bytes) -> User:
+        """Returns the User of a verified header, or None"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            user, password, expires_at = entry
+            if time.monotonic() >= expires_at or \
+                    user.password != password or \
+                    User.get(user.id) is not user:
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return user
+
+    def put(self, digest: bytes, user: User):
+        """Caches the User of a verified header"""
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = (user, user.password,
+                                     time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str = None):
+        """Drops the entries of a user, or all entries"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                return
+            for digest in [digest for digest, entry
+                           in self._entries.items()
+                           if entry[0].id == user_id]:
+                del self._entries[digest]
+
+    def __len__(self) -> int:
+        """Returns the number of entries"""
+        return len(self._entries)
+
+
+class BasicAuth(Auth):
+    """Basic authentication.
+
+    Verified Authorization headers are cached for CREDENTIALS_CACHE_TTL
+    seconds (default 60, 0 disables the cache), at most
+    CREDENTIALS_CACHE_SIZE of them (default 10000).
+    """
+
+    def __init__(self):
+        """Initializes the credentials cache"""
+        super().__init__()
+        self.credentials_cache = CredentialsCache(
+            env_number("CREDENTIALS_CACHE_TTL", 60),
+            int(env_number("CREDENTIALS_CACHE_SIZE", 10000)))
+
+    def extract_base64_authorization_header(
+            self, authorization_header: str) -> str:
+        """Returns the Base64 part of a Basic Authorization header"""
+        if authorization_header is None or \
+                type(authorization_header) is not str or \
+                not authorization_header.startswith("Basic "):
+            return None
+        return authorization_header[len("Basic "):]
+
+    def decode_base64_authorization_header(
+            self, base64_authorization_header: str) -> str:
+        """Returns the decoded value of a Base64 string"""
+        if base64_authorization_header is None or \
+                type(base64_authorization_header) is not str:
+            return None
+        try:
+            decoded = base64.b64decode(base64_authorization_header,
+                                       validate=True)
+            return decoded.decode('utf-8')
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def extract_user_credentials(
+            self, decoded_base64_authorization_header: str
+    ) -> Tuple[str, str]:
+        """Returns the email and password of decoded credentials"""
+        decoded = decoded_base64_authorization_header
+        if decoded is None or type(decoded) is not str or ':' not in decoded:
+            return None, None
+        email, password = decoded.split(':', 1)
+        return email, password
+
+    def user_object_from_credentials(self, user_email: str,
+                                     user_pwd: str) -> User:
+        """Returns the User of an email and password"""
+        if user_email is None or type(user_email) is not str or \
+                user_pwd is None or type(user_pwd) is not str:
+            return None
+        try:
+            users = User.search({'email': user_email})
+        except Exception:
+            return None
+        for user in users:
+            if user.is_valid_password(user_pwd):
+                return user
+        return None
+
+    def current_user(self, request=None) -> User:
+        """Returns the User of the Authorization header of a request"""
+        authorization_header = self.authorization_header(request)
+        if authorization_header is None or \
+                type(authorization_header) is not str:
+            return None
+        digest = self.credentials_cache.digest(authorization_header)
+        user = self.credentials_cache.get(digest)
+        if user is not None:
+            return user
+        base64_header = self.extract_base64_authorization_header(
+            authorization_header)
+        decoded = self.decode_base64_authorization_header(base64_header)
+        email, password = self.extract_user_credentials(decoded)
+        user = self.user_object_from_credentials(email, password)
+        if user is not None:
+            self.credentials_cache.put(digest, user)
+        return user
@@ -1,6 +1,136 @@
 #!/usr/bin/env python3
+"""
+Module for session authentication
+"""
 from api.v1.auth.auth import Auth
+from collections import OrderedDict
+from models.user import User
+from os import getenv
+import heapq
+import threading
+import time
+import uuid
+
+
+def env_int(name: str, default: int) -> int:
+    """Reads an integer environment variable, default if unset or invalid"""
+    try:
+        return int(getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class SessionStore:
+    """In-memory map of session IDs to user IDs.
+
+    A session expires `ttl` seconds after its creation, never if `ttl` is
+    0 or less. Expiry times are kept in a heap, so expired sessions are
+    dropped without scanning. At most `max_sessions` sessions are kept
+    (no limit if 0 or less), the least recently used one is evicted first.
+    """
+
+    def __init__(self, ttl: int = 0, max_sessions: int = 0):
+        """Initializes an empty SessionStore"""
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session ID -> (user ID, expiry time or None), oldest use first
+        self._sessions = OrderedDict()
+        # (expiry time, session ID), may hold sessions gone since
+        self._expiry = []
+        self._lock = threading.Lock()
+
+    def create(self, user_id: str) -> str:
+        """Creates a session for a user and returns its ID"""
+        session_id = str(uuid.uuid4())
+        now = time.monotonic()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._expire(now)
+            self._sessions[session_id] = (user_id, expires_at)
+            if expires_at is not None:
+                heapq.heappush(self._expiry, (expires_at, session_id))
+            if 0 < self.max_sessions < len(self._sessions):
+                self._sessions.popitem(last=False)
+            if len(self._expiry) > 2 * len(self._sessions) + 64:
+                self._expiry = [(session[1], key) for key, session
+                                in self._sessions.items()
+                                if session[1] is not None]
+                heapq.heapify(self._expiry)
+        return session_id
+
+    def get(self, session_id: str) -> str:
+        """Returns the user ID of a live session, or None"""
+        with self._lock:
+            self._expire(time.monotonic())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return session[0]
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+        with self._lock:
+            self._expire(time.monotonic())
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self, now: float):
+        """Drops the sessions expired at `now`, called with the lock held"""
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, session_id = heapq.heappop(self._expiry)
+            session = self._sessions.get(session_id)
+            if session is not None and session[1] == expires_at:
+                del self._sessions[session_id]
+
+    def __len__(self) -> int:
+        """Returns the number of sessions, including expired ones not
+        dropped yet"""
+        return len(self._sessions)
 
 
 class SessionAuth(Auth):
-    pass
+    """Session authentication, sessions are kept in memory.
+
+    SESSION_NAME is the name of the session cookie, SESSION_DURATION the
+    lifetime of a session in seconds and SESSION_MAX_COUNT the maximum
+    number of sessions kept.
+    """
+
+    def __init__(self):
+        """Initializes the session store"""
+        super().__init__()
+        self.session_name = getenv("SESSION_NAME")
+        self.store = SessionStore(env_int("SESSION_DURATION", 0),
+                                  env_int("SESSION_MAX_COUNT", 100000))
+
+    def create_session(self, user_id: str = None) -> str:
+        """Creates a session for a user ID and returns the session ID"""
+        if user_id is None or type(user_id) is not str:
+            return None
+        return self.store.create(user_id)
+
+    def user_id_for_session_id(self, session_id: str = None) -> str:
+        """Returns the user ID of a session ID"""
+        if session_id is None or type(session_id) is not str:
+            return None
+        return self.store.get(session_id)
+
+    def session_cookie(self, request=None) -> str:
+        """Returns the session ID from the cookie of a request"""
+        if request is None or self.session_name is None:
+            return None
+        return request.cookies.get(self.session_name)
+
+    def current_user(self, request=None) -> User:
+        """Returns the User of the session of a request"""
+        user_id = self.user_id_for_session_id(self.session_cookie(request))
+        if user_id is None:
+            return None
+        return User.get(user_id)
+
+    def destroy_session(self, request=None) -> bool:
+        """Deletes the session of a request, logging the user out"""
+        session_id = self.session_cookie(request)
+        if session_id is None:
+            return False
+        return self.store.delete(session_id)
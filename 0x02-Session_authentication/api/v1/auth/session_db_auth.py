@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Module for session authentication with sessions stored in SQLite
+"""
+from api.v1.auth.session_auth import SessionAuth, env_int
+from collections import OrderedDict
+from os import getenv
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+
+class SQLiteSessionStore:
+    """Map of session IDs to user IDs in a SQLite file in WAL mode, shared
+    by all the workers using the same file.
+
+    Each worker keeps up to `cache_size` sessions read in a cache for
+    `cache_ttl` seconds, so a session deleted by another worker may still
+    be accepted here for that long. A background thread deletes expired
+    sessions every `sweep_interval` seconds, `sweep_batch` rows at a time.
+
+    Nothing is opened before the first use in a process, and connections
+    and the sweeper belong to the process that made them, so the store can
+    be created before workers are forked (gunicorn --preload).
+    """
+
+    def __init__(self, db_path: str, ttl: int = 0, cache_size: int = 1024,
+                 cache_ttl: int = 5, sweep_interval: int = 60,
+                 sweep_batch: int = 1000):
+        """Initializes the store, the database is opened on first use"""
+        if sweep_batch < 1:
+            raise ValueError("sweep_batch must be at least 1")
+        self.db_path = db_path
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._local = threading.local()
+        # session ID -> (user ID, expiry time or None, cached until)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        # process the schema was checked and the sweeper started in
+        self._pid = None
+        if hasattr(os, "register_at_fork"):
+            store = weakref.ref(self)
+            os.register_at_fork(
+                after_in_child=lambda: store() and store()._after_fork())
+
+    def _after_fork(self):
+        """Drops the state inherited from the parent in a forked child"""
+        self._local = threading.local()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _start(self):
+        """Creates the schema and starts the sweeper of this process"""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            db = self._connect()
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                           "session_id TEXT PRIMARY KEY, "
+                           "user_id TEXT NOT NULL, "
+                           "created_at REAL NOT NULL, "
+                           "expires_at REAL)")
+                db.execute("CREATE INDEX IF NOT EXISTS sessions_expires_at "
+                           "ON sessions (expires_at)")
+            self._sweeper = None
+            if self.sweep_interval > 0:
+                self._sweeper = threading.Thread(target=self._sweep_loop,
+                                                 daemon=True)
+                self._sweeper.start()
+            self._pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens a connection for the current thread"""
+        db = sqlite3.connect(self.db_path, timeout=5)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        self._local.db = db
+        self._local.pid = os.getpid()
+        return db
+
+    def _db(self) -> sqlite3.Connection:
+        """Returns the connection of the current thread, never one made
+        before a fork"""
+        if self._pid != os.getpid():
+            self._start()
+        if getattr(self._local, "pid", None) != os.getpid():
+            return self._connect()
+        return self._local.db
+
+    def create(self, user_id: str) -> str:
+        """Creates a session for a user and returns its ID"""
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl > 0 else None
+        db = self._db()
+        with db:
+            db.execute("INSERT INTO sessions "
+                       "(session_id, user_id, created_at, expires_at) "
+                       "VALUES (?, ?, ?, ?)",
+                       (session_id, user_id, now, expires_at))
+        self._cache_put(session_id, user_id, expires_at, now)
+        return session_id
+
+    def get(self, session_id: str) -> str:
+        """Returns the user ID of a live session, or None"""
+        now = time.time()
+        with self._cache_lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                user_id, expires_at, cached_until = entry
+                if now < cached_until and \
+                        (expires_at is None or now < expires_at):
+                    self._cache.move_to_end(session_id)
+                    return user_id
+                del self._cache[session_id]
+        row = self._db().execute(
+            "SELECT user_id, expires_at FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+        if row is None:
+            return None
+        user_id, expires_at = row
+        if expires_at is not None and now >= expires_at:
+            return None
+        self._cache_put(session_id, user_id, expires_at, now)
+        return user_id
+
+    def delete(self, session_id: str) -> bool:
+        """Deletes a session, returns False if it doesn't exist"""
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+        db = self._db()
+        with db:
+            cursor = db.execute("DELETE FROM sessions WHERE session_id = ?",
+                                (session_id,))
+        return cursor.rowcount > 0
+
+    def _cache_put(self, session_id: str, user_id: str, expires_at: float,
+                   now: float):
+        """Caches a session read or created by this worker"""
+        if self.cache_size <= 0 or self.cache_ttl <= 0:
+            return
+        with self._cache_lock:
+            self._cache[session_id] = (user_id, expires_at,
+                                       now + self.cache_ttl)
+            self._cache.move_to_end(session_id)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def sweep(self) -> int:
+        """Deletes the expired sessions in batches, returns their number"""
+        db = self._db()
+        deleted = 0
+        while True:
+            with db:
+                cursor = db.execute(
+                    "DELETE FROM sessions WHERE session_id IN ("
+                    "SELECT session_id FROM sessions WHERE expires_at <= ? "
+                    "LIMIT ?)", (time.time(), self.sweep_batch))
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.sweep_batch:
+                return deleted
+
+    def _sweep_loop(self):
+        """Sweeps every sweep_interval seconds until closed"""
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                continue
+
+    def close(self):
+        """Stops the sweeper"""
+        self._stop.set()
+
+    def __len__(self) -> int:
+        """Returns the number of sessions, including expired ones not
+        swept yet"""
+        return self._db().execute(
+            "SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class SessionDBAuth(SessionAuth):
+    """Session authentication, sessions are stored in a SQLite file
+    shared by all workers.
+
+    SESSION_DB_PATH is the database file, SESSION_CACHE_SIZE and
+    SESSION_CACHE_TTL bound the cache of each worker, SESSION_SWEEP_INTERVAL
+    and SESSION_SWEEP_BATCH set how expired sessions are deleted.
+    """
+
+    def __init__(self):
+        """Opens the session database"""
+        super().__init__()
+        self.store = SQLiteSessionStore(
+            getenv("SESSION_DB_PATH", ".db_sessions.sqlite3"),
+            env_int("SESSION_DURATION", 0),
+            env_int("SESSION_CACHE_SIZE", 1024),
+            env_int("SESSION_CACHE_TTL", 5),
+            env_int("SESSION_SWEEP_INTERVAL", 60),
+            env_int("SESSION_SWEEP_BATCH", 1000))
@@ -3,6 +3,7 @@
 """
 from flask import Flask, jsonify, make_response, redirect, request, abort
 from auth import Auth
+from throttle import Throttled
 
 app = Flask(__name__)
 AUTH = Auth()
@@ -56,7 +57,15 @@ def login() -> str:
     if not email or not password:
         # 401 for missing credentials
         abort(401, description="Unauthorized")
-    if not AUTH.valid_login(email, password):
+    try:
+        valid = AUTH.valid_login(email, password, request.remote_addr)
+    except Throttled as e:
+        # 429 so clients back off instead of retrying at once
+        response = make_response(
+            jsonify({"message": "too many login attempts"}), 429)
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    if not valid:
         # 401 for invalid credentials
         abort(401, description="Unauthorized")
     session_id = AUTH.create_session(email)
@@ -2,6 +2,7 @@
 """Auth module
 """
 from db import DB, NoResultFound
+from throttle import LoginThrottle, Throttled
 from user import User
 import bcrypt
 import os
@@ -31,6 +32,7 @@ class Auth:
     def __init__(self):
         """Initializes an Auth instance."""
         self._db = DB()
+        self._throttle = LoginThrottle()
 
     def register_user(self, email: str, password: str) -> User:
         """Registers a new user."""
@@ -42,18 +44,29 @@ class Auth:
             user = self._db.add_user(email, hashed_password)
             return user
 
-    def valid_login(self, email: str, password: str) -> bool:
+    def valid_login(self, email: str, password: str, ip: str = None) -> bool:
         """Checks if the provided email and
         password match a registered user.
+
+        Attempts over the per-email or per-IP budget, or finding every
+        verification slot busy for too long, are rejected without hashing.
+
+        Raises:
+            Throttled: If the attempt was shed, with the seconds to wait.
         """
-        try:
-            user = self._db.find_user_by(email=email)
-            if bcrypt.checkpw(password.encode('utf-8'), user.hashed_password):
-                return True
-            else:
+        self._throttle.check(email, ip)
+        with self._throttle.verification() as allowed:
+            if not allowed:
+                raise Throttled(1)
+            try:
+                user = self._db.find_user_by(email=email)
+                if bcrypt.checkpw(password.encode('utf-8'),
+                                  user.hashed_password):
+                    return True
+                else:
+                    return False
+            except NoResultFound:
                 return False
-        except NoResultFound:
-            return False
         
     def get_reset_password_token(self, email: str) -> str:
         """Generates a reset password token for the given email.
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Throttle module
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+# Seconds a login waits for a free verification slot before being shed
+VERIFICATION_TIMEOUT = 0.5
+
+
+class Throttled(Exception):
+    """Raised when an attempt is shed, retry_after is in whole seconds."""
+
+    def __init__(self, retry_after: float) -> None:
+        """Initializes the exception.
+
+        Args:
+            retry_after: seconds before a new attempt may succeed.
+        """
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            f"Too many attempts, retry after {self.retry_after}s")
+
+
+class TokenBucket:
+    """Per-key token buckets with expiring, bounded state.
+
+    Each key holds only (tokens, last refill time). A key is forgotten once
+    its bucket would be full again, and the least recently used keys are
+    evicted past max_keys, so memory stays bounded under a key flood.
+    """
+
+    def __init__(self, rate: float, burst: int,
+                 max_keys: int = 100000) -> None:
+        """Initializes the buckets.
+
+        Args:
+            rate: tokens refilled per second.
+            burst: the capacity of a bucket.
+            max_keys: the maximum number of tracked keys.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._ttl = burst / rate
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str) -> bool:
+        """Takes one token from the bucket of key.
+
+        Returns:
+            True if a token was available, False if key is over budget.
+        """
+        return self.take(key) == 0
+
+    def take(self, key: str) -> float:
+        """Takes one token from the bucket of key.
+
+        Returns:
+            0 if a token was available, else the seconds until one is.
+        """
+        now = time.monotonic()
+        buckets = self._buckets
+        with self._lock:
+            state = buckets.pop(key, None)
+            if state is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst,
+                             state[0] + (now - state[1]) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            buckets[key] = (tokens, now)
+            self._expire(now)
+        return 0.0 if allowed else (1 - tokens) / self.rate
+
+    def _expire(self, now: float) -> None:
+        """Drops refilled and least recently used keys."""
+        buckets = self._buckets
+        while buckets:
+            key, (tokens, last) = next(iter(buckets.items()))
+            if len(buckets) <= self.max_keys and now - last < self._ttl:
+                break
+            del buckets[key]
+
+    def __len__(self) -> int:
+        """Returns the number of tracked keys."""
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """Sheds login attempts before any password hashing happens.
+
+    Attempts are limited per email and per client IP, and the number of
+    concurrent password verifications is capped process wide.
+    """
+
+    def __init__(self, email_rate: float = 0.1, email_burst: int = 5,
+                 ip_rate: float = 1.0, ip_burst: int = 20,
+                 max_concurrent: int = None) -> None:
+        """Initializes the throttle.
+
+        Args:
+            email_rate: attempts per second refilled for each email.
+            email_burst: attempts allowed at once for each email.
+            ip_rate: attempts per second refilled for each IP.
+            ip_burst: attempts allowed at once for each IP.
+            max_concurrent: concurrent verifications, the CPU count if None.
+        """
+        self._emails = TokenBucket(email_rate, email_burst)
+        self._ips = TokenBucket(ip_rate, ip_burst)
+        self._slots = threading.BoundedSemaphore(
+            max_concurrent or os.cpu_count() or 1)
+
+    def allow(self, email: str, ip: Optional[str] = None) -> bool:
+        """Checks and charges the budgets of an attempt.
+
+        Returns:
+            True if the attempt may proceed to password verification.
+        """
+        try:
+            self.check(email, ip)
+        except Throttled:
+            return False
+        return True
+
+    def check(self, email: str, ip: Optional[str] = None) -> None:
+        """Checks and charges the budgets of an attempt.
+
+        Raises:
+            Throttled: if the IP or the email is over budget.
+        """
+        if ip is not None:
+            wait = self._ips.take(ip)
+            if wait:
+                raise Throttled(wait)
+        wait = self._emails.take(email.lower())
+        if wait:
+            raise Throttled(wait)
+
+    @contextmanager
+    def verification(self, timeout: float = VERIFICATION_TIMEOUT
+                     ) -> Iterator[bool]:
+        """Holds a verification slot for the duration of a with block,
+        waiting up to timeout seconds for one to free up.
+
+        Yields:
+            True if a slot was acquired, False if the attempt should be shed.
+        """
+        acquired = self._slots.acquire(timeout=timeout)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._slots.release()